@@ -0,0 +1,291 @@
+"""Apply parsed CASE statements to DataFrames with vectorized masks.
+
+``parse_case_statement`` documents a rule as combo rows; ``CaseEvaluator``
+compiles the same conditions into predicates once and applies them to a
+whole frame. Each WHEN branch becomes one NumPy boolean mask, branches are
+tried in priority order so the first match wins, rows that no branch
+matches get the ELSE value, and the output column is written in one take:
+
+    evaluator = compile_case_statement(case_sql)
+    df = evaluator.apply(df)
+"""
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from case_to_dict import ConditionParser, tokenize_condition
+from parse_case_statements import iter_minimized, split_case_statement
+
+WILDCARD = '*'
+DIRECT_MAPPED = 'direct mapped'
+
+_COMPARISON = re.compile(r"(<=|>=|!=|<|>)\s*(.*)", re.DOTALL)
+_QUOTED = re.compile(r"'((?:[^']|'')*)'")
+_DATE = re.compile(r"date\s*\(\s*'([^']*)'\s*\)", re.IGNORECASE)
+_NUMBER = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+_BARE_WORD = re.compile(r"[\w.]*")
+_EXPRESSION = re.compile(r"@|[\w.]+\s*\(")
+
+_OPERATORS = {
+    '=': lambda col, value: col == value,
+    '!=': lambda col, value: col != value,
+    '<': lambda col, value: col < value,
+    '<=': lambda col, value: col <= value,
+    '>': lambda col, value: col > value,
+    '>=': lambda col, value: col >= value,
+}
+
+
+class Predicate(NamedTuple):
+    column: str
+    op: str
+    value: Any  # str, int, float or pd.Timestamp
+    text: str   # the literal as written, used against text columns
+
+
+def parse_literal(text: str, unquoted: bool = False) -> Tuple[Any, str]:
+    """Return ``(value, text)`` for a literal: a quoted string, a number, ``date('...')`` or a bare word.
+
+    Bare words are strings, since IN lists keep their values unquoted.
+    With ``unquoted`` so is any other text that is not a function call or
+    an @parameter, as IN values such as ``'new york'`` arrive without
+    their quotes. Anything else (column arithmetic, @parameters, other
+    functions) raises ValueError.
+    """
+    text = text.strip()
+    quoted = _QUOTED.fullmatch(text)
+    if quoted:
+        value = quoted.group(1).replace("''", "'")
+        return value, value
+    date = _DATE.fullmatch(text)
+    if date:
+        return pd.Timestamp(date.group(1)), date.group(1)
+    if _NUMBER.fullmatch(text):
+        return (float(text) if any(c in text for c in '.eE') else int(text)), text
+    if _BARE_WORD.fullmatch(text) or (unquoted and not _EXPRESSION.match(text)):
+        return text, text
+    raise ValueError(f"Unsupported expression {text!r}")
+
+
+def parse_predicate(column: str, spec: str) -> Optional[Predicate]:
+    """Predicate for one combo cell such as ``'x'``, ``3`` or ``<= date ( '2024-01-01' )``; None for '*'.
+
+    A cell without an operator is an equality, which IN lists leave unquoted.
+    """
+    if spec == WILDCARD:
+        return None
+    comparison = _COMPARISON.fullmatch(spec)
+    if comparison is None:
+        return Predicate(column, '=', *parse_literal(spec, unquoted=True))
+    op, literal = comparison.groups()
+    return Predicate(column, op, *parse_literal(literal))
+
+
+class _ConjunctionParser(ConditionParser):
+    """``ConditionParser`` that keeps a condition as a list of alternative predicate conjunctions.
+
+    Combo rows hold one value per column, so ANDing ``age >= 18`` with
+    ``age < 65`` there is a conflict that drops the row; a conjunction
+    keeps both predicates on the column.
+    """
+
+    def parse_condition(self) -> List[Tuple[Predicate, ...]]:
+        (col, values), = super().parse_condition().items()
+        return [(parse_predicate(col, value),) for value in values]
+
+    def parse_and(self) -> List[Tuple[Predicate, ...]]:
+        res = self.parse_factor()
+        while self.peek() and self.peek().lower() == 'and':
+            self.consume('and')
+            right = self.parse_factor()
+            res = [left + conjunction for left in res for conjunction in right]
+        return res
+
+    def parse_or(self) -> List[Tuple[Predicate, ...]]:
+        res = self.parse_and()
+        while self.peek() and self.peek().lower() == 'or':
+            self.consume('or')
+            res = res + self.parse_and()
+        return res
+
+
+class _FrameColumns:
+    """Columns of the frame being evaluated, converted once to match the literals compared with them."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._dates: Dict[str, pd.Series] = {}
+
+    def series(self, pred: Predicate) -> pd.Series:
+        series = self.df[pred.column]
+        if isinstance(pred.value, pd.Timestamp) and series.dtype.kind != 'M':
+            if pred.column not in self._dates:
+                self._dates[pred.column] = pd.to_datetime(series, errors='coerce')
+            series = self._dates[pred.column]
+        return series
+
+    def literal(self, pred: Predicate, series: pd.Series) -> Any:
+        """The literal in the column's terms: numbers for numeric columns, text for text columns."""
+        kind = series.dtype.kind
+        if kind in 'iufb':
+            if isinstance(pred.value, str):
+                try:
+                    return float(pred.value)
+                except ValueError:
+                    raise ValueError(f"Cannot compare numeric column {pred.column!r} with {pred.text!r}") from None
+            return pred.value
+        if kind == 'M' or isinstance(pred.value, pd.Timestamp):
+            return pd.Timestamp(pred.value)
+        return pred.text
+
+    def mask(self, pred: Predicate) -> np.ndarray:
+        series = self.series(pred)
+        result = _OPERATORS[pred.op](series, self.literal(pred, series))
+        if pred.op == '!=':
+            # As in SQL, a NULL is neither equal nor unequal to anything
+            result &= series.notna()
+        return result.to_numpy(dtype=bool, na_value=False)
+
+    def isin(self, columns: Tuple[str, ...], rows: List[Tuple[Predicate, ...]]) -> np.ndarray:
+        """Rows whose values in ``columns`` equal one of the literal tuples in ``rows``.
+
+        Each column is looked up in a hash index of its literals, and the
+        codes are combined column by column into a key that is re-coded
+        against the keys of the wanted tuples, so the key space never
+        exceeds the number of tuples however many columns there are.
+        """
+        keys = np.zeros(len(self.df), dtype=np.int64)
+        wanted = np.zeros(len(rows), dtype=np.int64)
+        matched = np.ones(len(self.df), dtype=bool)
+        for i, column in enumerate(columns):
+            series = self.series(rows[0][i])
+            literal_codes, literals = pd.factorize(pd.Series([self.literal(row[i], series) for row in rows],
+                                                             dtype=object))
+            codes = pd.Index(literals).get_indexer(series)
+            matched &= codes >= 0
+            keys = keys * len(literals) + codes
+            wanted = wanted * len(literals) + literal_codes
+            wanted, wanted_keys = pd.factorize(wanted)
+            keys = pd.Index(wanted_keys).get_indexer(keys)
+            matched &= keys >= 0
+        return matched
+
+
+class CaseEvaluator:
+    """A CASE statement compiled into per-branch predicates for vectorized evaluation.
+
+    ``branches`` holds ``(output value, combos)`` in priority order, where
+    each combo is the tuple of predicates that must all hold; consecutive
+    WHEN clauses with the same output share a branch. ``default`` is the
+    ELSE value (None without ELSE).
+    """
+
+    def __init__(self, branches: List[Tuple[Any, List[Tuple[Predicate, ...]]]], default: Any = None,
+                 output_col: str = 'output'):
+        self.branches = branches
+        self.default = default
+        self.output_col = output_col
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]], output_col: Optional[str] = None) -> 'CaseEvaluator':
+        """Compile combo rows as produced by ``parse_case_statement`` (a list or a stream of them).
+
+        The output column defaults to the last key of the first row. A row
+        whose conditions are all '*' matches everything, so it becomes the
+        default and any rows after it are unreachable.
+        """
+        branches = []
+        default = None
+        for row in rows:
+            if output_col is None:
+                output_col = list(row)[-1]
+            output = row[DIRECT_MAPPED]
+            combo = tuple(pred for col, spec in row.items() if col not in (DIRECT_MAPPED, output_col)
+                          for pred in [parse_predicate(col, spec)] if pred is not None)
+            if not combo:
+                default = output
+                break
+            if branches and branches[-1][0] == output:
+                branches[-1][1].append(combo)
+            else:
+                branches.append((output, [combo]))
+        return cls(branches, default, output_col or 'output')
+
+    def columns(self) -> List[str]:
+        """Frame columns the conditions refer to, in first-seen order."""
+        cols = {}
+        for _, combos in self.branches:
+            for combo in combos:
+                cols.update(dict.fromkeys(pred.column for pred in combo))
+        return list(cols)
+
+    def _branch_mask(self, frame: _FrameColumns, combos: List[Tuple[Predicate, ...]]) -> np.ndarray:
+        # Combos that differ only in the values of their equality predicates
+        # are tested together with one hash lookup over those columns
+        groups: Dict[Tuple[Tuple[str, ...], Tuple[Predicate, ...]], List[Tuple[Predicate, ...]]] = {}
+        for combo in combos:
+            equal = tuple(sorted((pred for pred in combo if pred.op == '='), key=lambda pred: pred.column))
+            other = tuple(sorted((pred for pred in combo if pred.op != '='), key=lambda pred: pred[:2] + (pred.text,)))
+            groups.setdefault((tuple(pred.column for pred in equal), other), []).append(equal)
+
+        atoms: Dict[Predicate, np.ndarray] = {}
+        mask = np.zeros(len(frame.df), dtype=bool)
+        for (columns, other), rows in groups.items():
+            group = frame.isin(columns, rows) if columns else np.ones(len(frame.df), dtype=bool)
+            for pred in other:
+                if pred not in atoms:
+                    atoms[pred] = frame.mask(pred)
+                group &= atoms[pred]
+            mask |= group
+        return mask
+
+    def branch_index(self, df: pd.DataFrame) -> np.ndarray:
+        """Position of the first branch each row matches, ``len(branches)`` for rows that match none."""
+        missing = [col for col in self.columns() if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns missing from the frame: {missing}")
+        frame = _FrameColumns(df)
+        choice = np.full(len(df), len(self.branches), dtype=np.min_scalar_type(len(self.branches)))
+        unmatched = np.ones(len(df), dtype=bool)
+        for i, (_, combos) in enumerate(self.branches):
+            if not unmatched.any():
+                break
+            # Only rows no earlier branch claimed take this branch
+            mask = self._branch_mask(frame, combos) & unmatched
+            choice[mask] = i
+            unmatched &= ~mask
+        return choice
+
+    def evaluate(self, df: pd.DataFrame) -> np.ndarray:
+        """The CASE result for every row of ``df``, as an object array aligned with it."""
+        outputs = np.array([output for output, _ in self.branches] + [self.default], dtype=object)
+        return outputs[self.branch_index(df)]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Return ``df`` with the CASE result written to ``output_col``."""
+        return df.assign(**{self.output_col: self.evaluate(df)})
+
+
+def compile_case_statement(case_str: str) -> CaseEvaluator:
+    """Compile a CASE statement for ``CaseEvaluator.apply``.
+
+    Each WHEN condition is parsed into conjunctions of predicates rather
+    than into combo rows, so several predicates on one column (``age >= 18
+    and age < 65``) all apply. Conjunctions that an earlier one with the
+    same output already covers are left out. Unlike the decision-table
+    output, the statement is not lowercased: column names and string
+    literals are matched against the data exactly as written, and only
+    the SQL keywords ignore case.
+    """
+    when_blocks, default, output_col = split_case_statement(case_str.strip())
+    conjunctions = ((output, combo, (output, combo)) for condition, output in when_blocks
+                    for combo in _ConjunctionParser(tokenize_condition(condition)).parse())
+    branches = []
+    for output, combo in iter_minimized(conjunctions):
+        if branches and branches[-1][0] == output:
+            branches[-1][1].append(combo)
+        else:
+            branches.append((output, [combo]))
+    return CaseEvaluator(branches, default, output_col)
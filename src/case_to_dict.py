@@ -1,135 +1,391 @@
+import re
+from functools import lru_cache
+from itertools import product
+from math import prod
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+
 def normalize_column_name(col: str) -> str:
     return col.split('.')[-1]
 
-def parse_condition_to_combos(condition_str):
-    import re
-    # Tokenization pattern: catches multi-char operators, words, strings, symbols
-    token_pattern = re.compile(r"""
-        \s*(
-            <=|>=|!=|<>|=|<|>|      # comparison operators
-            \bAND\b|\bOR\b|\bIN\b| # logic keywords
-            \(|\)|,|               # symbols
-            '[^']*'|               # quoted string
-            @?[\w.]+                 # identifiers with optional @ for sql param (column names, values)
-        )\s*
-    """, re.IGNORECASE | re.VERBOSE)
-    
-    tokens = token_pattern.findall(condition_str)
-    tokens = [t.strip() for t in tokens if t.strip()]
-    
-    index = 0
-    col_order = []
-
-    def peek():
-        return tokens[index] if index < len(tokens) else None
-
-    def consume(expected=None):
-        nonlocal index
-        tok = peek()
+# Tokenization pattern: catches multi-char operators, words, strings, symbols
+TOKEN_PATTERN = re.compile(r"""
+    \s*(
+        <=|>=|!=|<>|=|<|>|      # comparison operators
+        \bAND\b|\bOR\b|\bIN\b| # logic keywords
+        \(|\)|,|               # symbols
+        '[^']*'|               # quoted string
+        @?[\w.]+                 # identifiers with optional @ for sql param (column names, values)
+    )\s*
+""", re.IGNORECASE | re.VERBOSE)
+
+# Clause keywords of a CASE statement, bounded the way TOKEN_PATTERN bounds
+# identifiers so that e.g. "when_flag" or "t.end" are not keywords
+CLAUSE_PATTERN = re.compile(r"(?<![\w.@])(case|when|then|else|end)(?![\w.])", re.IGNORECASE)
+
+# Number of distinct conditions (and token sequences) kept parsed
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def tokenize_condition(condition_str: str) -> Tuple[str, ...]:
+    """Split a WHEN condition into tokens; the token tuple is the normalized form of the condition."""
+    return tuple(TOKEN_PATTERN.findall(condition_str))
+
+
+def parse_value_token(val_tok: str) -> str:
+    if val_tok.startswith("'") and val_tok.endswith("'"):
+        return val_tok[1:-1]
+    try:
+        return str(int(val_tok))
+    except ValueError:
+        try:
+            return str(float(val_tok))
+        except ValueError:
+            return val_tok
+
+
+# A product term: each column maps to its alternative values, and the term
+# stands for every combination of one value per column
+Term = Dict[str, Tuple[str, ...]]
+
+
+class _Or(NamedTuple):
+    children: Tuple[Any, ...]
+
+
+class _And(NamedTuple):
+    left: Any
+    right: Any
+
+
+def _merge_terms(left: Term, right: Term) -> Optional[Term]:
+    """Term of the row pairs of ``left`` and ``right`` that agree on shared columns (None if none do).
+
+    A shared value is repeated once per matching pair, so the term has one
+    row per pair, as the row-by-row merge would produce.
+    """
+    term = dict(left)
+    for col, values in right.items():
+        if col in term:
+            values = tuple(v for v in term[col] for w in values if v == w)
+            if not values:
+                return None
+        term[col] = values
+    return term
+
+
+def merge_and(left: List[Term], right: List[Term]) -> List[Term]:
+    """AND of two lists of product terms, pairing every term of ``left`` with every term of ``right``."""
+    merged = (_merge_terms(l, r) for l in left for r in right)
+    return [term for term in merged if term is not None]
+
+
+def _or(left: Any, right: Any) -> _Or:
+    children = lambda node: node.children if isinstance(node, _Or) else (node,)
+    return _Or(children(left) + children(right))
+
+
+def _and(left: Any, right: Any) -> Any:
+    """Node for ``left AND right``.
+
+    A single-term right side is pushed into the last term of every branch
+    of ``left`` and merged there, which yields the same rows in the same
+    order as pairing them up one by one, unless a value repeats in a shared
+    column; anything else stays an ``_And`` that is paired up on expansion.
+    """
+    if not isinstance(right, dict):
+        return _And(left, right)
+    if isinstance(left, _Or):
+        return _Or(tuple(_and(child, right) for child in left.children))
+    if isinstance(left, _And):
+        return _And(left.left, _and(left.right, right))
+    if any(len(set(right[col])) != len(right[col]) for col in right if col in left):
+        return _And(left, right)
+    term = _merge_terms(left, right)
+    return _Or(()) if term is None else term
+
+
+def _expand(node: Any) -> Iterator[Dict[str, str]]:
+    if isinstance(node, dict):
+        cols = list(node)
+        for values in product(*node.values()):
+            yield dict(zip(cols, values))
+    elif isinstance(node, _Or):
+        for child in node.children:
+            yield from _expand(child)
+    else:
+        for l in _expand(node.left):
+            for r in _expand(node.right):
+                combo = l.copy()
+                for k, v in r.items():
+                    if k in combo and combo[k] != v:
+                        break
+                    combo[k] = v
+                else:
+                    yield combo
+
+
+def _columns(node: Any) -> Dict[str, None]:
+    """Every column the node mentions, in first-seen order, whether or not a row survives."""
+    if isinstance(node, dict):
+        return dict.fromkeys(node)
+    children = node.children if isinstance(node, _Or) else (node.left, node.right)
+    cols = {}
+    for child in children:
+        cols.update(_columns(child))
+    return cols
+
+
+def _profile(node: Any, cols: Tuple[str, ...]) -> Dict[Tuple[Optional[str], ...], int]:
+    """How many rows ``_expand`` yields per projection onto ``cols`` (None where a row lacks the column).
+
+    An AND pairs its sides' profiles over ``cols`` plus the columns both
+    sides mention, which are the only ones a pair can disagree on, so rows
+    are counted without being built and the work grows with the number of
+    distinct shared values rather than with the number of rows.
+    """
+    profile: Dict[Tuple[Optional[str], ...], int] = {}
+    if isinstance(node, dict):
+        rest = prod(len(values) for col, values in node.items() if col not in cols)
+        if rest:
+            for key in product(*(node.get(col, (None,)) for col in cols)):
+                profile[key] = profile.get(key, 0) + rest
+    elif isinstance(node, _Or):
+        for child in node.children:
+            for key, n in _profile(child, cols).items():
+                profile[key] = profile.get(key, 0) + n
+    else:
+        right_cols = _columns(node.right)
+        full = cols + tuple(col for col in _columns(node.left) if col in right_cols and col not in cols)
+        right = _profile(node.right, full)
+        for left_key, left_n in _profile(node.left, full).items():
+            for right_key, right_n in right.items():
+                merged = []
+                for l, r in zip(left_key, right_key):
+                    if l is not None and r is not None and l != r:
+                        break
+                    merged.append(r if l is None else l)
+                else:
+                    key = tuple(merged[:len(cols)])
+                    profile[key] = profile.get(key, 0) + left_n * right_n
+    return profile
+
+
+def _terms(node: Any) -> List[Term]:
+    if isinstance(node, dict):
+        return [node]
+    if isinstance(node, _Or):
+        return [term for child in node.children for term in _terms(child)]
+    return merge_and(_terms(node.left), _terms(node.right))
+
+
+def _dedup(node: Any) -> Any:
+    """``node`` without repeated values in its terms and without OR children an earlier child covers.
+
+    A one-column child loses the values that earlier one-column children
+    on the same column already yield, found by hashing; a wider child is
+    dropped when an earlier child with the same columns has a superset of
+    its values in each. AND nodes are deduplicated side by side and never
+    multiplied out, so the work and the result grow with the condition
+    rather than with its rows.
+    """
+    if isinstance(node, dict):
+        return {col: tuple(dict.fromkeys(values)) for col, values in node.items()}
+    if isinstance(node, _And):
+        return _And(_dedup(node.left), _dedup(node.right))
+    seen: Dict[str, set] = {}
+    wide: Dict[FrozenSet[str], List[Dict[str, set]]] = {}
+    children = []
+    for child in map(_dedup, node.children):
+        if isinstance(child, dict) and len(child) == 1:
+            (col, values), = child.items()
+            yielded = seen.setdefault(col, set())
+            child = {col: tuple(value for value in values if value not in yielded)}
+            if not child[col]:
+                continue
+            yielded.update(child[col])
+        elif isinstance(child, dict):
+            value_sets = {col: set(values) for col, values in child.items()}
+            earlier = wide.setdefault(frozenset(child), [])
+            if any(all(value_sets[col] <= other[col] for col in child) for other in earlier):
+                continue
+            earlier.append(value_sets)
+        children.append(child)
+    return _Or(tuple(children))
+
+
+class Combos:
+    """Column -> value combos of a condition, kept factored until iterated.
+
+    Comparisons and IN lists are product terms (a column -> values dict)
+    combined by AND/OR nodes, so ``a IN (...50) AND b IN (...50)`` is one
+    term of two 50-value columns rather than 2500 dicts and memory grows
+    with the size of the condition. Iterating expands the rows lazily, in
+    the order the eager cartesian merge used to build them. ``count`` and
+    ``columns`` work on the node tree without expanding rows or terms.
+    The nodes are shared with the parse cache and must not be modified.
+    """
+
+    __slots__ = ('node',)
+
+    def __init__(self, node: Any):
+        self.node = node
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return _expand(self.node)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __repr__(self) -> str:
+        return f"Combos({self.node!r})"
+
+    @property
+    def terms(self) -> List[Term]:
+        """The combos as a flat union of product terms, each row appearing as often as iteration yields it.
+
+        ANDs of ORs multiply out here, so the terms are built on every
+        call rather than kept alongside the cached parse.
+        """
+        return _terms(self.node)
+
+    def count(self) -> int:
+        """Number of rows iteration yields, without expanding them."""
+        return sum(_profile(self.node, ()).values())
+
+    def columns(self) -> List[str]:
+        """Columns that appear in at least one row, in first-seen order over the condition."""
+        return [col for col in _columns(self.node) if any(key != (None,) for key in _profile(self.node, (col,)))]
+
+    def dedup(self) -> 'Combos':
+        """Combos without repeated values or OR branches covered by an earlier branch; see ``_dedup``.
+
+        Rows that only repeat across the sides of an AND can still repeat.
+        """
+        return Combos(_dedup(self.node))
+
+
+class ConditionParser:
+    """Recursive-descent parser from condition tokens to a ``Combos`` node tree.
+
+    A comparison or IN list is a one-column term, OR and AND combine nodes
+    via ``_or`` and ``_and``; parentheses group as usual.
+    """
+
+    def __init__(self, tokens: Sequence[str]):
+        self.tokens = tokens
+        self.index = 0
+        self.col_order: List[str] = []
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def consume(self, expected: Optional[str] = None) -> Optional[str]:
+        tok = self.peek()
         if tok and (expected is None or tok.lower() == expected.lower()):
-            index += 1
+            self.index += 1
             return tok
         return None
 
-    def parse_value_token(val_tok):
-        val = val_tok
-        if val.startswith("'") and val.endswith("'"):
-            return val[1:-1]
-        try:
-            return str(int(val))
-        except ValueError:
-            try:
-                return str(float(val))
-            except ValueError:
-                return val
+    def parse(self) -> Any:
+        return self.parse_or()
 
-    def parse_condition():
-        col_token = consume()
+    def parse_condition(self) -> Any:
+        col_token = self.consume()
         col = normalize_column_name(col_token)
-        if col not in col_order:
-            col_order.append(col)
-        op = consume()
-        op_map = {'<>': '!='}  # normalize <>
-        if op in op_map:
-            op = op_map[op]
+        if col not in self.col_order:
+            self.col_order.append(col)
+        op = self.consume()
+        if op is None:
+            raise ValueError(f"Expected an operator after {col_token!r}")
+        if op == '<>':  # normalize <>
+            op = '!='
         if op.lower() == 'in':
-            consume('(')
+            self.consume('(')
             values = []
             while True:
-                val_tok = consume()
+                val_tok = self.consume()
                 if val_tok in [')', None]:
                     break
                 if val_tok != ',':
-                    val = parse_value_token(val_tok)
-                    values.append({col: val})
-            return values
-        else:
-            # After an operator, capture full expression like: date('2023-01-01') or now()
-            val_parts = []
-            parens = 0
-            while True:
-                tok = peek()
-                if tok is None:
-                    break
-                if tok.lower() in ('and', 'or') and parens == 0:
+                    values.append(parse_value_token(val_tok))
+            return {col: tuple(values)}
+        # After an operator, capture full expression like: date('2023-01-01') or now()
+        val_parts = []
+        parens = 0
+        while True:
+            tok = self.peek()
+            if tok is None:
+                break
+            if tok.lower() in ('and', 'or') and parens == 0:
+                break
+            if tok == '(':
+                parens += 1
+            elif tok == ')':
+                if parens == 0:
                     break
-                if tok == '(':
-                    parens += 1
-                elif tok == ')':
-                    if parens == 0:
-                        break
-                    parens -= 1
-                val_parts.append(consume())
-            val_expr = ' '.join(val_parts)
-            # Clean quotes, or keep as raw expression
-            val = val_expr.strip()
-            if op == '=':
-                return [{col: val}]
-            else:
-                return [{col: f"{op} {val}"}]
-
-    def parse_factor():
-        if peek() == '(':
-            consume('(')
-            res = parse_or()
-            consume(')')
+                parens -= 1
+            val_parts.append(self.consume())
+        val = ' '.join(val_parts).strip()
+        if op == '=':
+            return {col: (val,)}
+        return {col: (f"{op} {val}",)}
+
+    def parse_factor(self) -> Any:
+        if self.peek() == '(':
+            self.consume('(')
+            res = self.parse_or()
+            self.consume(')')
             return res
-        else:
-            return parse_condition()
+        return self.parse_condition()
 
-    def merge_and(left, right):
-        merged = []
-        for l in left:
-            for r in right:
-                combo = l.copy()
-                conflict = False
-                for k, v in r.items():
-                    if k in combo and combo[k] != v:
-                        conflict = True
-                        break
-                    combo[k] = v
-                if not conflict:
-                    merged.append(combo)
-        return merged
-
-    def parse_and():
-        res = parse_factor()
-        while peek() and peek().lower() == 'and':
-            consume('and')
-            right = parse_factor()
-            res = merge_and(res, right)
+    def parse_and(self) -> Any:
+        res = self.parse_factor()
+        while self.peek() and self.peek().lower() == 'and':
+            self.consume('and')
+            res = _and(res, self.parse_factor())
         return res
 
-    def parse_or():
-        res = parse_and()
-        while peek() and peek().lower() == 'or':
-            consume('or')
-            right = parse_and()
-            res.extend(right)
+    def parse_or(self) -> Any:
+        res = self.parse_and()
+        while self.peek() and self.peek().lower() == 'or':
+            self.consume('or')
+            res = _or(res, self.parse_and())
         return res
 
-    combos = parse_or()
-    return combos, col_order
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_tokens(tokens: Tuple[str, ...]) -> Tuple[Combos, Tuple[str, ...]]:
+    parser = ConditionParser(tokens)
+    combos = Combos(parser.parse())
+    return combos, tuple(parser.col_order)
+
+
+def parse_condition(condition_str: str) -> Tuple[Combos, List[str]]:
+    """Parse a WHEN condition into factored ``Combos`` and the column order, without expanding rows.
+
+    Tokenizing and parsing are memoized (keyed by the raw text and by the
+    token tuple), so a condition repeated across a rule file is parsed once.
+    """
+    combos, col_order = _parse_tokens(tokenize_condition(condition_str))
+    return combos, list(col_order)
+
+
+def parse_condition_to_combos(condition_str: str) -> Tuple[List[Dict[str, str]], List[str]]:
+    """Parse a WHEN condition into its list of column -> value combos and the column order.
+
+    The combos are the expanded rows of ``parse_condition``; the caller
+    gets fresh dicts it is free to modify.
+    """
+    combos, col_order = parse_condition(condition_str)
+    return list(combos), col_order
+
+
+def clear_parse_cache() -> None:
+    """Drop all memoized conditions."""
+    tokenize_condition.cache_clear()
+    _parse_tokens.cache_clear()
 
 def print_combinations_table(combos, col_order):
     """Print the list of combination dictionaries as a table with given column order."""
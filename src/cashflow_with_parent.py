@@ -1,29 +1,110 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from .rollup_io import write_frames
 
-def generate_random_hierarchy(max_depth=6):
-    depth = random.randint(1, max_depth)
-    return '.'.join(str(random.randint(1, 9)) for _ in range(depth))
+START_DATE = "01-DEC-2014"
+DATE_FORMAT = "%d-%b-%Y"
 
-# Ensure unique hierarchies
-hierarchies = set()
-while len(hierarchies) < 400:
-    hierarchies.add(generate_random_hierarchy())
+def _path_radix(max_depth, fanout):
+    """Powers of (fanout + 1) used to pack a path into one int64, one digit per level."""
+    base = fanout + 1
+    if base ** max_depth >= 2 ** 63:
+        raise ValueError(f"max_depth={max_depth} with fanout={fanout} does not fit in an int64 path code")
+    return base ** np.arange(max_depth, dtype=np.int64)
 
-# Create the DataFrame
-df_cff = pd.DataFrame({'hierarchy': list(hierarchies)[:10]})
+def generate_hierarchy_codes(n_rows, rng, max_depth=6, fanout=9, depth_weights=None):
+    """Draw ``n_rows`` unique paths, packed as int64 codes.
 
-# Generate date columns
-start_date = datetime.strptime("01-DEC-2014", "%d-%b-%Y")
-date_columns = [(start_date + timedelta(days=i)).strftime("%d-%b-%Y") for i in range(250)]
+    Segment i of a path (values 1..fanout) is digit i of the code in base
+    fanout + 1, and a 0 digit marks the end of a shorter path, so distinct
+    paths get distinct codes and uniqueness is a vectorized sort-and-compare.
+    ``depth_weights[d - 1]`` is the relative frequency of depth ``d``
+    (uniform by default).
+    """
+    weights = np.ones(max_depth) if depth_weights is None else np.asarray(depth_weights, dtype=float)
+    if len(weights) != max_depth:
+        raise ValueError("depth_weights needs one weight per depth 1..max_depth")
+    weights = weights / weights.sum()
+    capacity = sum(fanout ** depth for depth in range(1, max_depth + 1) if weights[depth - 1] > 0)
+    if n_rows > capacity:
+        raise ValueError(f"Only {capacity} unique paths exist for max_depth={max_depth}, fanout={fanout}")
+    radix = _path_radix(max_depth, fanout)
 
-# Create a dictionary to hold the amount columns
-amount_columns = {date: np.round(np.random.uniform(0, 1000000000, size=len(df_cff)), 2) for date in date_columns}
+    codes = np.array([], dtype=np.int64)
+    while len(codes) < n_rows:
+        draw = max(2 * (n_rows - len(codes)), 1024)
+        depths = rng.choice(np.arange(1, max_depth + 1), size=draw, p=weights)
+        new_codes = np.zeros(draw, dtype=np.int64)
+        for level in range(max_depth):
+            segments = rng.integers(1, fanout + 1, size=draw, dtype=np.int64)
+            new_codes += np.where(level < depths, segments, 0) * radix[level]
+        codes = np.sort(np.concatenate([codes, new_codes]))
+        codes = codes[np.r_[True, codes[1:] != codes[:-1]]]
+    # Deduplication sorts, so pick the survivors at random rather than the smallest codes
+    return rng.choice(codes, size=n_rows, replace=False)
 
-# Concatenate the amount columns to the DataFrame
-df_cff = pd.concat([df_cff, pd.DataFrame(amount_columns)], axis=1)
+def decode_hierarchies(codes, max_depth=6, fanout=9):
+    """Turn packed path codes back into dotted strings such as '3.1.4'."""
+    codes = np.asarray(codes, dtype=np.int64)
+    radix = _path_radix(max_depth, fanout)
+    labels = np.array([str(segment) for segment in range(fanout + 1)], dtype=object)
+    dotted = '.' + labels
+    paths = labels[codes % (fanout + 1)]
+    for level in range(1, max_depth):
+        digit = codes // radix[level] % (fanout + 1)
+        present = digit > 0
+        paths[present] = paths[present] + dotted[digit[present]]
+    return paths
 
-print(df_cff.shape)  # (400, 250)
-print(df_cff.head())
+def date_columns(n_cols, start_date=START_DATE):
+    return list(pd.date_range(pd.to_datetime(start_date, format=DATE_FORMAT), periods=n_cols).strftime(DATE_FORMAT))
+
+def iter_cashflow_chunks(n_rows, n_cols=250, max_depth=6, fanout=9, depth_weights=None,
+                         seed=None, chunk_rows=100_000) -> Iterator[pd.DataFrame]:
+    """Yield the synthetic cash-flow frame in chunks of ``chunk_rows`` rows.
+
+    Paths are drawn up front as int64 codes (8 bytes per row) and only
+    decoded to strings chunk by chunk, and the amount block is generated per
+    chunk, so memory stays bounded by the chunk size. The output is fully
+    determined by ``seed`` and ``chunk_rows``.
+    """
+    rng = np.random.default_rng(seed)
+    codes = generate_hierarchy_codes(n_rows, rng, max_depth, fanout, depth_weights)
+    columns = date_columns(n_cols)
+    for start in range(0, n_rows, chunk_rows):
+        chunk_codes = codes[start:start + chunk_rows]
+        amounts = np.round(rng.uniform(0, 1000000000, size=(len(chunk_codes), n_cols)), 2)
+        chunk = pd.DataFrame(amounts, columns=columns)
+        chunk.insert(0, 'hierarchy', decode_hierarchies(chunk_codes, max_depth, fanout))
+        yield chunk
+
+def generate_cashflow_frame(n_rows=10, max_depth=6, n_cols=250, fanout=9, seed=None, depth_weights=None):
+    """Build a frame of ``n_rows`` unique hierarchy paths with ``n_cols`` daily amount columns."""
+    chunks = list(iter_cashflow_chunks(n_rows, n_cols, max_depth, fanout, depth_weights, seed,
+                                       chunk_rows=max(n_rows, 1)))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['hierarchy', *date_columns(n_cols)])
+
+def write_cashflow_data(path, n_rows, format: Optional[str] = None, chunk_rows=100_000,
+                        compression: Optional[str] = None, **generator_kwargs) -> None:
+    """Stream a synthetic cash-flow dataset straight to a CSV, Parquet, Feather or Arrow file.
+
+    ``format`` defaults to the file suffix. Each chunk is appended as it is
+    generated (one row group or record batch per chunk), so 10M-row
+    load-test inputs never have to fit in memory.
+    """
+    chunks = iter_cashflow_chunks(n_rows, chunk_rows=chunk_rows, **generator_kwargs)
+    write_frames(chunks, path, format, compression)
+
+def __getattr__(name):
+    # df_cff is built on first use rather than at import time
+    if name == 'df_cff':
+        global df_cff
+        df_cff = generate_cashflow_frame()
+        return df_cff
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+if __name__ == "__main__":
+    df_cff = generate_cashflow_frame()
+    print(df_cff.shape)  # (10, 251)
+    print(df_cff.head())
@@ -0,0 +1,185 @@
+"""Hash and interval indexes for looking up records in a decision table.
+
+A decision table is a list of combo rows from ``parse_case_statement`` (or
+``parse_condition_to_combos``) in priority order. ``DecisionIndex`` finds
+the first row a record satisfies without scanning the rows. Every row is
+one bit of a Python int, and for each column the index keeps
+
+- a hash map from each equality value to the bitmask of rows requiring it,
+- the sorted boundaries of the range predicates (<, <=, >, >=, !=) and the
+  bitmask of rows satisfied on each interval between and at them, found
+  with bisect,
+- the bitmask of rows that do not constrain the column ('*' or absent).
+
+A record's candidates are the AND of its column masks and the first match
+is the lowest set bit, so a lookup is a hash probe and a bisect per column
+plus a few word-parallel ANDs. The ELSE row is '*' everywhere, which
+makes it the fallback.
+"""
+import numbers
+from bisect import bisect_left
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from case_evaluator import DIRECT_MAPPED, parse_predicate
+from parse_case_statements import output_columns
+
+
+def _family(value: Any) -> Optional[str]:
+    """Which range boundaries ``value`` can be ordered against: 'text', 'date' or 'number'."""
+    if isinstance(value, str):
+        return 'text'
+    if isinstance(value, date):
+        return 'date'
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return 'number'
+    return None
+
+
+def _lowest_bit(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+
+class _ColumnIndex:
+    __slots__ = ('unconstrained', 'equal', 'ranges')
+
+    def __init__(self):
+        self.unconstrained = 0
+        self.equal: Dict[Any, int] = {}
+        # family -> (sorted boundaries, mask per interval: below b0, at b0, between b0 and b1, at b1, ...)
+        self.ranges: Dict[str, Tuple[list, List[int]]] = {}
+
+    def mask(self, value: Any) -> int:
+        """Bitmask of the rows whose condition on this column ``value`` satisfies."""
+        if value is None or value is pd.NA or value != value:
+            # NULLs only pass rows that do not look at the column
+            return self.unconstrained
+        if isinstance(value, (np.datetime64, date)):
+            # Date boundaries are Timestamps, which do not compare with datetime.date
+            value = pd.Timestamp(value)
+        mask = self.unconstrained | self.equal.get(value, 0)
+        ranges = self.ranges.get(_family(value))
+        if ranges:
+            bounds, intervals = ranges
+            i = bisect_left(bounds, value)
+            mask |= intervals[2 * i + 1 if i < len(bounds) and bounds[i] == value else 2 * i]
+        return mask
+
+
+def _interval_masks(bounds: list, predicates: List[Tuple[str, Any, int]]) -> List[int]:
+    """Mask per interval of ``bounds`` for ``(op, boundary, row bit)`` range predicates.
+
+    Each predicate holds on one or two runs of intervals; its bit is
+    toggled where a run starts and ends and the toggles are accumulated
+    left to right.
+    """
+    n = 2 * len(bounds) + 1
+    toggles = [0] * (n + 1)
+    position = {bound: i for i, bound in enumerate(bounds)}
+    for op, boundary, bit in predicates:
+        at = 2 * position[boundary] + 1
+        runs = {'<': [(0, at)], '<=': [(0, at + 1)], '>': [(at + 1, n)], '>=': [(at, n)],
+                '!=': [(0, at), (at + 1, n)]}[op]
+        for start, end in runs:
+            toggles[start] ^= bit
+            toggles[end] ^= bit
+    masks, mask = [], 0
+    for toggle in toggles[:n]:
+        mask ^= toggle
+        masks.append(mask)
+    return masks
+
+
+class DecisionIndex:
+    """First-match lookup over decision table rows; see the module docstring.
+
+    ``output_cols`` are the row keys that are results rather than
+    conditions. By default they are 'direct mapped' and the output column
+    after it when the rows come from ``parse_case_statement``, and none
+    otherwise. Records should carry typed values (numbers, strings,
+    Timestamps), since range predicates only compare like with like.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, str]], output_cols: Optional[Sequence[str]] = None):
+        self.rows = list(rows)
+        if output_cols is None:
+            output_cols = output_columns(self.rows[0]) if self.rows else ()
+        self.output_cols = tuple(output_cols)
+        self._all = (1 << len(self.rows)) - 1
+
+        self._columns: Dict[str, _ColumnIndex] = {}
+        constrained: Dict[str, int] = {}
+        ranges: Dict[Tuple[str, str], List[Tuple[str, Any, int]]] = {}
+        for position, row in enumerate(self.rows):
+            bit = 1 << position
+            for col, spec in row.items():
+                if col in self.output_cols:
+                    continue
+                column = self._columns.setdefault(col, _ColumnIndex())
+                pred = parse_predicate(col, spec)
+                if pred is None:
+                    continue
+                constrained[col] = constrained.get(col, 0) | bit
+                if pred.op == '=':
+                    for key in {pred.value, pred.text}:
+                        column.equal[key] = column.equal.get(key, 0) | bit
+                else:
+                    ranges.setdefault((col, _family(pred.value)), []).append((pred.op, pred.value, bit))
+
+        for col, column in self._columns.items():
+            column.unconstrained = self._all & ~constrained.get(col, 0)
+        for (col, family), predicates in ranges.items():
+            bounds = sorted({value for _, value, _ in predicates})
+            self._columns[col].ranges[family] = (bounds, _interval_masks(bounds, predicates))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def columns(self) -> List[str]:
+        """Condition columns, in first-seen order."""
+        return list(self._columns)
+
+    def lookup(self, record: Mapping[str, Any]) -> Optional[int]:
+        """Position of the first row ``record`` satisfies, or None; missing keys count as NULL."""
+        candidates = self._all
+        for col, column in self._columns.items():
+            candidates &= column.mask(record.get(col))
+            if not candidates:
+                return None
+        # A table without rows has no columns, so the loop never got to check
+        return _lowest_bit(candidates) if candidates else None
+
+    def match(self, record: Mapping[str, Any]) -> Optional[Dict[str, str]]:
+        """The first row ``record`` satisfies, or None."""
+        position = self.lookup(record)
+        return None if position is None else self.rows[position]
+
+    def lookup_frame(self, df: pd.DataFrame) -> np.ndarray:
+        """``lookup`` for every row of ``df``, with -1 where no row matches.
+
+        Each column is factorized and its masks computed once per distinct
+        value. The codes are then combined column by column into codes of
+        distinct value tuples, so the masks are ANDed once per distinct
+        record rather than once per frame row.
+        """
+        keys = np.zeros(len(df), dtype=np.int64)
+        masks = [self._all]
+        for col, column in self._columns.items():
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                col_masks = [column.mask(value) for value in uniques] + [column.unconstrained]
+                codes = np.where(codes < 0, len(uniques), codes)
+            else:
+                codes, col_masks = np.zeros(len(df), dtype=np.int64), [column.unconstrained]
+            keys, combined = pd.factorize(keys * len(col_masks) + codes)
+            masks = [masks[key // len(col_masks)] & col_masks[key % len(col_masks)] for key in combined]
+        positions = np.array([_lowest_bit(mask) for mask in masks], dtype=np.int64)
+        return positions[keys] if len(df) else np.array([], dtype=np.int64)
+
+    def outputs(self, df: pd.DataFrame, column: str = DIRECT_MAPPED) -> np.ndarray:
+        """The ``column`` value of each frame row's first matching row (None where nothing matches)."""
+        values = np.array([row.get(column) for row in self.rows] + [None], dtype=object)
+        return values[self.lookup_frame(df)]
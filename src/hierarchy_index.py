@@ -0,0 +1,163 @@
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+
+def _identity(ufunc: np.ufunc, dtype: np.dtype) -> Any:
+    """Starting value for reducing ``dtype`` values with ``ufunc``."""
+    if ufunc in (np.minimum, np.fmin):
+        return np.inf if dtype.kind == 'f' else np.iinfo(dtype).max
+    if ufunc in (np.maximum, np.fmax):
+        return -np.inf if dtype.kind == 'f' else np.iinfo(dtype).min
+    return ufunc.identity
+
+
+class HierarchyIndex:
+    """Integer-encoded trie over dotted hierarchy paths such as '1.2.3'.
+
+    Every distinct path segment is interned once in ``segments`` and the tree
+    is stored as flat int arrays indexed by node id:
+
+    - ``segment``: id of the node's own segment in ``segments``
+    - ``parent``: parent node id, -1 for top-level nodes
+    - ``depth``: 1 for top-level nodes, i.e. ``len(path.split('.'))``
+    - ``size``: number of nodes in the subtree rooted at the node
+
+    Node ids are assigned in output order (a preorder walk with siblings
+    sorted by segment text), so the subtree of node ``n`` is the id range
+    ``[n, n + size[n])`` and rolled-up results need no sorting. ``row_nodes``
+    maps each input path back to its node.
+    """
+
+    def __init__(self, segments: np.ndarray, segment: np.ndarray, parent: np.ndarray,
+                 depth: np.ndarray, size: np.ndarray, row_nodes: np.ndarray):
+        self.segments = segments
+        self.segment = segment
+        self.parent = parent
+        self.depth = depth
+        self.size = size
+        self.row_nodes = row_nodes
+        self._keys: Optional[np.ndarray] = None
+        self._lookup: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_paths(cls, hierarchy: Any) -> 'HierarchyIndex':
+        import pandas as pd
+
+        paths = pd.Series(np.asarray(hierarchy, dtype=object)).astype(str)
+        if paths.empty:
+            empty = np.array([], dtype=np.int32)
+            return cls(np.array([], dtype=object), empty, empty, empty, empty, empty)
+
+        parts = paths.str.split('.', expand=True).to_numpy(dtype=object)
+        present = pd.notna(parts)
+        # Intern the segments; sort=True makes code order match text order
+        seg_codes = np.full(parts.shape, -1, dtype=np.int64)
+        seg_codes[present], segments = pd.factorize(parts[present], sort=True)
+        n_segments = max(len(segments), 1)
+
+        # Number the nodes level by level: a node is (parent node, segment)
+        row_level_nodes = np.full(parts.shape, -1, dtype=np.int64)
+        node_segment, node_parent, node_depth, node_row = [], [], [], []
+        n_nodes = 0
+        for level in range(parts.shape[1]):
+            rows = np.flatnonzero(present[:, level])
+            parents = row_level_nodes[rows, level - 1] if level else np.full(len(rows), -1)
+            node_keys = (parents + 1) * n_segments + seg_codes[rows, level]
+            _, first, local = np.unique(node_keys, return_index=True, return_inverse=True)
+            row_level_nodes[rows, level] = n_nodes + local
+            node_segment.append(seg_codes[rows[first], level])
+            node_parent.append(parents[first])
+            node_depth.append(np.full(len(first), level + 1))
+            node_row.append(rows[first])
+            n_nodes += len(first)
+        node_parent = np.concatenate(node_parent)
+        node_depth = np.concatenate(node_depth)
+        node_row = np.concatenate(node_row)
+
+        # Preorder: sort nodes by their segment-code path, shorter paths first
+        code_paths = seg_codes[node_row]
+        code_paths[np.arange(parts.shape[1]) >= node_depth[:, None]] = -1
+        preorder = np.lexsort(code_paths.T[::-1])
+        new_id = np.empty(n_nodes, dtype=np.int64)
+        new_id[preorder] = np.arange(n_nodes)
+
+        parent = np.where(node_parent[preorder] >= 0, new_id[node_parent[preorder]], -1)
+        depth = node_depth[preorder]
+        size = np.ones(n_nodes, dtype=np.int64)
+        for level in range(depth.max(), 1, -1):
+            at_level = np.flatnonzero(depth == level)
+            np.add.at(size, parent[at_level], size[at_level])
+
+        leaf_level = present.sum(axis=1) - 1
+        row_nodes = new_id[row_level_nodes[np.arange(len(paths)), leaf_level]]
+        return cls(np.asarray(segments, dtype=object),
+                   np.concatenate(node_segment)[preorder].astype(np.int32),
+                   parent.astype(np.int32), depth.astype(np.int32), size.astype(np.int32),
+                   row_nodes.astype(np.int32))
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    @property
+    def max_depth(self) -> int:
+        return int(self.depth.max()) if len(self) else 0
+
+    def levels(self):
+        """Yield the node ids of each level, deepest level first."""
+        for level in range(self.max_depth, 0, -1):
+            yield level, np.flatnonzero(self.depth == level)
+
+    def subtree(self, node: int) -> Tuple[int, int]:
+        """Return the half-open node id range covering ``node`` and its descendants."""
+        return node, node + int(self.size[node])
+
+    def ancestor_pairs(self, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Expand rows into (row position, node id) pairs for the row's node and every ancestor."""
+        row_idx = np.arange(len(self.row_nodes)) if rows is None else np.asarray(rows)
+        nodes = self.row_nodes[row_idx].astype(np.int64)
+        row_parts, node_parts = [], []
+        while len(nodes):
+            row_parts.append(row_idx)
+            node_parts.append(nodes)
+            nodes = self.parent[nodes].astype(np.int64)
+            keep = nodes >= 0
+            row_idx, nodes = row_idx[keep], nodes[keep]
+        if not row_parts:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.int64)
+        return np.concatenate(row_parts), np.concatenate(node_parts)
+
+    def rollup_values(self, values: np.ndarray, ufunc: np.ufunc = np.add) -> np.ndarray:
+        """Reduce a (row x column) block aligned with ``row_nodes`` up to every node.
+
+        Rows are first folded into their own node, then each level is folded
+        into its parents from the bottom up, so every node is visited once.
+        ``ufunc`` is the reduction: np.add for sums, np.fmin/np.fmax for
+        NaN-skipping minimum/maximum.
+        """
+        out = np.full((len(self),) + values.shape[1:], _identity(ufunc, values.dtype), dtype=values.dtype)
+        ufunc.at(out, self.row_nodes, values)
+        for level, nodes in self.levels():
+            if level > 1:
+                ufunc.at(out, self.parent[nodes], out[nodes])
+        return out
+
+    def keys(self) -> np.ndarray:
+        """Dotted path of every node, in node id order."""
+        if self._keys is None:
+            keys = np.empty(len(self), dtype=object)
+            for level in range(1, self.max_depth + 1):
+                nodes = np.flatnonzero(self.depth == level)
+                labels = self.segments[self.segment[nodes]]
+                keys[nodes] = labels if level == 1 else keys[self.parent[nodes]] + '.' + labels
+            self._keys = keys
+        return self._keys
+
+    def node(self, path: str) -> int:
+        """Return the node id for a dotted path, raising KeyError if it is not in the tree."""
+        if self._lookup is None:
+            self._lookup = {key: i for i, key in enumerate(self.keys())}
+        return self._lookup[path]
+
+    def __getstate__(self) -> dict:
+        # Keys and the lookup table are rebuilt on demand
+        return {**self.__dict__, '_keys': None, '_lookup': None}
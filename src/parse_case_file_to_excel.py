@@ -1,8 +1,15 @@
+import csv
+import json
+import os
 import re
-import pandas as pd
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from parse_case_statements import parse_case_statement
+from parse_case_statements import iter_case_statement, iter_minimized_combos, parse_case_statement
+from rule_cache import ParsedRuleCache, rule_hash, write_json_atomic
 
 # -- Helper: Parse multi-line case statements with key as sheet name --
 def load_rules_from_file(filepath: str) -> Dict[str, str]:
@@ -38,44 +45,221 @@ def fake_parse_case_to_combos(case_str: str):
         {"example_column": "val2", "direct mapped": "mapped_val", "output_column": "mapped_val"}
     ]
 
-# -- Write to Excel, each sheet named after the key --
-def parse_case_file_to_excel(filepath: str, output_file: str):
-    rules = load_rules_from_file(filepath)
+# Standardized column order
+COMMON_COLUMNS = [
+    "c", "c1", "c2", "age", "salary",  # your expected input columns
+    "output_column"  # always include these for output
+]
+OUTPUT_COLUMN = "output_column"
+
+WRITE_FORMATS = ('xlsx', 'csv', 'parquet')
+# Rows per Parquet row group when streaming a decision table
+PARQUET_BATCH_ROWS = 65_536
+# Written into CSV/Parquet output directories: the hash each file was written from
+OUTPUT_MANIFEST = '.decision_tables.json'
+
+def _resolve_jobs(n_jobs: int, n_rules: int) -> int:
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    return max(1, min(n_jobs, n_rules))
+
+def _default_chunksize(n_rules: int, n_jobs: int) -> int:
+    # About four chunks per worker, so that many small blocks do not each
+    # pay a round trip to a worker
+    return max(1, n_rules // (4 * n_jobs))
+
+# -- Lay combo rows out under the fixed header, without a DataFrame --
+def layout_rows(combos: Iterable[Dict[str, str]], common_columns: Sequence[str] = COMMON_COLUMNS) -> Iterator[List[str]]:
+    """One list per combo, in ``common_columns`` order.
+
+    The rule's output value goes under "output_column" (every combo carries
+    it as "direct mapped"), and columns the combo does not constrain are
+    left empty.
+    """
+    for combo in combos:
+        yield [combo["direct mapped"] if col == OUTPUT_COLUMN else combo.get(col, "") for col in common_columns]
+
+def iter_combos(case_str: str, minimize: bool = False) -> Iterator[Dict[str, str]]:
+    """The combo rows of one CASE block, without redundant rows with ``minimize``."""
+    combos = iter_case_statement(case_str)
+    return iter_minimized_combos(combos) if minimize else combos
+
+def decision_rows(case_str: str, common_columns: Sequence[str] = COMMON_COLUMNS,
+                  minimize: bool = False) -> List[List[str]]:
+    """All laid-out rows of one CASE block (the unit of work of the parallel mode)."""
+    return list(layout_rows(iter_combos(case_str, minimize), common_columns))
+
+def iter_cached_rules(rules: Dict[str, str], cache: ParsedRuleCache, n_jobs: int = 1,
+                      chunksize: Optional[int] = None) -> Iterator[Tuple[str, List[Dict[str, str]]]]:
+    """Yield ``(key, combos)`` per rule in order, parsing only blocks that are not in ``cache``.
+
+    Misses are parsed (across a pool with ``n_jobs > 1``) and stored; hits
+    are read from disk only when their turn comes. The rows are minimized
+    when the cache is.
+    """
+    misses = {key: case_str for key, case_str in rules.items() if (key, case_str) not in cache}
+    n_jobs = _resolve_jobs(n_jobs, len(misses))
+    parse = partial(parse_case_statement, minimize=cache.minimize)
+    with ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else nullcontext() as pool:
+        if pool is None:
+            parsed = map(parse, misses.values())
+        else:
+            parsed = pool.map(parse, misses.values(),
+                              chunksize=chunksize or _default_chunksize(len(misses), n_jobs))
+        for key, case_str in rules.items():
+            combos = cache.get(key, case_str) if key not in misses else None
+            if combos is None:
+                combos = next(parsed) if key in misses else parse(case_str)
+                cache.put(key, case_str, combos)
+            yield key, combos
+
+def iter_decision_tables(rules: Dict[str, str], n_jobs: int = 1, chunksize: Optional[int] = None,
+                         common_columns: Sequence[str] = COMMON_COLUMNS,
+                         cache: Optional[ParsedRuleCache] = None,
+                         minimize: bool = False) -> Iterator[Tuple[str, Iterable[List[str]]]]:
+    """Yield ``(key, rows)`` per rule, in file order, ready for ``write_decision_tables``.
+
+    Serially the rows are generated straight from the parser as the writer
+    consumes them. With ``n_jobs > 1`` each block is expanded in a worker
+    and its rows are written as soon as they come back, in order. With a
+    ``cache``, unchanged blocks are read back instead of parsed; it must
+    have been opened with the same ``minimize``. With ``minimize``,
+    duplicate rows and rows shadowed by an earlier one are left out (see
+    ``iter_minimized_combos``).
+    """
+    if cache is not None:
+        if cache.minimize != minimize:
+            raise ValueError(f"The cache holds rows parsed with minimize={cache.minimize}")
+        for key, combos in iter_cached_rules(rules, cache, n_jobs, chunksize):
+            yield key, layout_rows(combos, common_columns)
+        return
+    n_jobs = _resolve_jobs(n_jobs, len(rules))
+    if n_jobs == 1:
+        for key, case_str in rules.items():
+            yield key, layout_rows(iter_combos(case_str, minimize), common_columns)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        tables = pool.map(partial(decision_rows, common_columns=common_columns, minimize=minimize), rules.values(),
+                          chunksize=chunksize or _default_chunksize(len(rules), n_jobs))
+        yield from zip(rules.keys(), tables)
 
-    # print(f"Loaded rules: {rules}")
-    all_dataframes = {}
-
-    # First pass: parse and collect all combos + headers
-    for key, case_str in rules.items():
-        # parsed = parse_single_case(case_str)  # <- Replace with your real parser
-        # df = pd.DataFrame(parsed['combos'])
-        data = parse_case_statement(case_str)
-        df = pd.DataFrame(data)
-        all_dataframes[key] = df
-
-    # Standardized column order
-    common_columns = [
-            "c", "c1", "c2", "age", "salary",         # your expected input columns
-            "output_column"  # always include these for output
-        ]
-
-    # print(all_dataframes)
-    
-    # Write to Excel with consistent headers
-    with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
-        for sheet_name, df in all_dataframes.items():
-            # Step 1: Rename the actual output column to "output_column"
-            for col in df.columns:
-                if col not in common_columns and col != "direct mapped":
-                    df["output_column"] = df[col]
-                    df.drop(columns=[col], inplace=True)
-                    break  # we found the output column
-
-            # Step 2: Reindex using your fixed header list
-            df_out = df.reindex(columns=common_columns, fill_value="")
-            df_out.to_excel(writer, sheet_name=sheet_name[:31], index=False)
-            # print(df_out)
+# -- Streaming writers: one xlsx sheet, or one CSV/Parquet file, per rule --
+def _write_xlsx(tables: Iterable[Tuple[str, Iterable[Sequence[str]]]], output_file: str,
+                common_columns: Sequence[str]) -> None:
+    import xlsxwriter
 
+    # constant_memory flushes every row as soon as the next one starts
+    workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    try:
+        header = workbook.add_format({'bold': True, 'border': 1})
+        for sheet_name, rows in tables:
+            sheet = workbook.add_worksheet(sheet_name[:31])
+            sheet.write_row(0, 0, common_columns, header)
+            for i, row in enumerate(rows, 1):
+                for j, value in enumerate(row):
+                    if value:
+                        # write_string: values such as '= x' are data, not formulas
+                        sheet.write_string(i, j, value)
+    finally:
+        workbook.close()
+
+def _write_csv(path: str, rows: Iterable[Sequence[str]], common_columns: Sequence[str]) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(common_columns)
+        writer.writerows(rows)
+
+def _write_parquet(path: str, rows: Iterable[Sequence[str]], common_columns: Sequence[str]) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(col, pa.string()) for col in common_columns])
+    rows = iter(rows)
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            batch = list(islice(rows, PARQUET_BATCH_ROWS))
+            if not batch:
+                break
+            writer.write_batch(pa.record_batch([list(col) for col in zip(*batch)], schema=schema))
+
+def write_decision_tables(tables: Iterable[Tuple[str, Iterable[Sequence[str]]]], output: str, format: str = 'xlsx',
+                          common_columns: Sequence[str] = COMMON_COLUMNS) -> None:
+    """Stream laid-out decision tables to disk, one row at a time.
+
+    ``xlsx`` writes one sheet per table into the workbook ``output`` using
+    xlsxwriter's constant-memory mode. ``csv`` and ``parquet`` write one
+    ``<key>.csv`` / ``<key>.parquet`` file per table into the directory
+    ``output``, with the same header and the same cells (all strings,
+    empty where a column is unconstrained), for machine consumers.
+    """
+    if format not in WRITE_FORMATS:
+        raise ValueError(f"Unsupported format {format!r}; choose from {WRITE_FORMATS}")
+    if format == 'xlsx':
+        _write_xlsx(tables, output, common_columns)
+        return
+    os.makedirs(output, exist_ok=True)
+    write = _write_csv if format == 'csv' else _write_parquet
+    for key, rows in tables:
+        write(os.path.join(output, f"{key}.{format}"), rows, common_columns)
+
+def update_decision_tables(rules: Dict[str, str], output: str, format: str = 'csv', n_jobs: int = 1,
+                           cache: Optional[ParsedRuleCache] = None,
+                           common_columns: Sequence[str] = COMMON_COLUMNS, minimize: bool = False) -> List[str]:
+    """Bring a CSV/Parquet output directory up to date with ``rules``; returns the keys rewritten.
+
+    A manifest in the directory records the hash of the CASE text each
+    file was written from. Only files whose rule is new or changed (or
+    whose file is missing) are parsed and rewritten, and files of rules
+    that were removed are deleted, so the work scales with the edit
+    rather than with the rules file. Switching ``minimize`` changes the
+    hashes, so every file is rewritten.
+    """
+    if format not in WRITE_FORMATS or format == 'xlsx':
+        raise ValueError(f"Incremental updates need a per-rule format, one of {WRITE_FORMATS[1:]}")
+    manifest_path = os.path.join(output, OUTPUT_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+    # Files written in another format or layout are all out of date
+    same_layout = (manifest.get('format'), manifest.get('columns')) == (format, list(common_columns))
+    written = manifest.get('rules', {}) if same_layout else {}
+
+    hashes = {key: rule_hash(case_str, minimize) for key, case_str in rules.items()}
+    path = lambda key: os.path.join(output, f"{key}.{format}")
+    stale = {key: case_str for key, case_str in rules.items()
+             if written.get(key) != hashes[key] or not os.path.exists(path(key))}
+    # Files are removed in the format the manifest says they were written in
+    old_format = manifest.get('format')
+    for key in manifest.get('rules', {}):
+        old_path = os.path.join(output, f"{key}.{old_format}")
+        if (key not in rules or old_format != format) and old_format in WRITE_FORMATS and os.path.exists(old_path):
+            os.remove(old_path)
+
+    tables = iter_decision_tables(stale, n_jobs=n_jobs, common_columns=common_columns, cache=cache, minimize=minimize)
+    write_decision_tables(tables, output, format=format, common_columns=common_columns)
+    write_json_atomic(manifest_path, {'format': format, 'columns': list(common_columns), 'rules': hashes})
+    return list(stale)
+
+# -- Write to Excel, each sheet named after the key --
+def parse_case_file_to_excel(filepath: str, output_file: str, n_jobs: int = 1, format: str = 'xlsx',
+                             cache_dir: Optional[str] = None, minimize: bool = False):
+    """Write the decision tables of a rules file as an xlsx workbook or a CSV/Parquet directory.
+
+    With ``cache_dir``, parsed blocks are kept on disk and only edited
+    blocks are parsed again. CSV and Parquet directories are updated in
+    place, rewriting only the files of edited rules; a workbook cannot be
+    patched sheet by sheet, so it is always written in full. ``minimize``
+    leaves out rows that cannot change a first-match lookup.
+    """
+    rules = load_rules_from_file(filepath)
+    cache = ParsedRuleCache(cache_dir, minimize=minimize) if cache_dir else None
+    if format == 'xlsx':
+        tables = iter_decision_tables(rules, n_jobs=n_jobs, cache=cache, minimize=minimize)
+        write_decision_tables(tables, output_file, format=format)
+    else:
+        update_decision_tables(rules, output_file, format, n_jobs=n_jobs, cache=cache, minimize=minimize)
     print(f"✅ Written to {output_file} with consistent columns across sheets.")
 
 
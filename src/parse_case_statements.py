@@ -1,45 +1,176 @@
-import re
+from itertools import combinations
+from typing import Dict, FrozenSet, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
 
-from case_to_dict import parse_condition_to_combos, print_combinations_table
+from case_to_dict import CLAUSE_PATTERN, TOKEN_PATTERN, parse_condition, print_combinations_table
 
-def parse_case_statement(case_str):
-    # Normalize and strip
-    case_str = case_str.strip().lower()
-    assert case_str.startswith("case"), "Must start with CASE"
-    assert "end" in case_str, "Missing END"
 
-    # Extract 'as output_column'
-    match_alias = re.search(r'end\s+as\s+(\w+)', case_str)
-    output_col = match_alias.group(1) if match_alias else "output"
+def split_case_statement(case_str: str) -> Tuple[List[Tuple[str, str]], Optional[str], str]:
+    """Split a CASE statement into its clauses in one left-to-right scan.
+
+    Returns ``(when_blocks, else_value, output_col)`` where each WHEN block
+    is ``(condition text, THEN value)``. Keywords match in any case and
+    are only recognised as whole tokens outside quoted strings and outside
+    nested CASE ... END expressions, so a THEN value may itself be a CASE
+    expression or mention "when". THEN and ELSE values are taken verbatim
+    from the text, without surrounding quotes. The alias after ``END AS``
+    is optional and defaults to "output".
+    """
+    first = CLAUSE_PATTERN.match(case_str)
+    if first is None or first.group(1).lower() != 'case':
+        raise ValueError("Must start with CASE")
+
+    # Top-level clause keywords, up to the matching END
+    clauses = []
+    depth = 0
+    quotes, scanned = 0, first.end()
+    for match in CLAUSE_PATTERN.finditer(case_str, scanned):
+        # An odd number of quotes so far means the keyword is inside a string
+        start = match.start()
+        quotes += case_str.count("'", scanned, start)
+        scanned = start
+        if quotes & 1:
+            continue
+        keyword = match.group(1).lower()
+        if keyword == 'case':
+            depth += 1
+        elif keyword == 'end' and depth:
+            depth -= 1
+        elif depth == 0:
+            clauses.append(match)
+            if keyword == 'end':
+                break
+    else:
+        raise ValueError("Missing END")
 
-    # Strip 'case' and 'end as output_col'
-    body = case_str[4:match_alias.start()].strip()
+    when_blocks = []
+    else_value = None
+    condition = None
+    for match, next_match in zip(clauses, clauses[1:]):
+        keyword, next_keyword = match.group(1).lower(), next_match.group(1).lower()
+        text = case_str[match.end():next_match.start()].strip()
+        if keyword == 'when':
+            if next_keyword != 'then':
+                raise ValueError("WHEN without THEN")
+            condition = text
+        elif keyword == 'then':
+            if condition is None:
+                raise ValueError("THEN without WHEN")
+            when_blocks.append((condition, text.strip("'\"")))
+            condition = None
+        else:
+            if next_keyword != 'end':
+                raise ValueError("ELSE must be the last clause")
+            else_value = text.strip("'\"")
 
-    # Split into WHEN ... THEN ... blocks
-    when_blocks = re.findall(r'when\s+(.*?)\s+then\s+(.*?)(?=\s+when|\s+else|\s*$)', body, re.DOTALL)
-    else_match = re.search(r'else\s+(.*)', body)
+    alias = TOKEN_PATTERN.findall(case_str, clauses[-1].end())
+    output_col = alias[1] if len(alias) >= 2 and alias[0].lower() == 'as' else "output"
+    return when_blocks, else_value, output_col
 
-    all_combos = []
-    all_cols = set()
-    for condition, then_val in when_blocks:
-        then_val = then_val.strip().strip("'\"")
-        combos, col_order = parse_condition_to_combos(condition)
+
+def iter_case_statement(case_str: str, lowercase: bool = True) -> Iterator[Dict[str, str]]:
+    """Yield the combo rows of a CASE statement one at a time.
+
+    Conditions are parsed into factored ``Combos`` and only expanded as
+    rows are consumed, so a statement whose WHEN clauses multiply out to
+    millions of rows can be streamed to a writer in constant memory. The
+    statement is lowercased first unless ``lowercase`` is False, in which
+    case column names and values keep the case they were written in.
+    """
+    # Normalize and strip
+    case_str = case_str.strip()
+    if lowercase:
+        case_str = case_str.lower()
+    when_blocks, else_val, output_col = split_case_statement(case_str)
+    parsed = [(parse_condition(condition)[0], then_val) for condition, then_val in when_blocks]
+
+    # Columns of the rows actually yielded, for the ELSE row
+    all_cols = {}
+    for combos, then_val in parsed:
         for c in combos:
+            if else_val is not None:
+                all_cols.update(dict.fromkeys(c))
             c["direct mapped"] = then_val
             c[output_col] = then_val
-            all_cols.update(c.keys())
-        all_combos.extend(combos)
+            yield c
 
     # Handle ELSE block with wildcard "*"
-    if else_match:
-        else_val = else_match.group(1).strip().strip("'\"")
+    if else_val is not None:
         wildcard_row = {k: '*' for k in all_cols if k not in ("direct mapped", output_col)}
         wildcard_row["direct mapped"] = else_val
         wildcard_row[output_col] = else_val
-        all_combos.append(wildcard_row)
+        yield wildcard_row
+
+
+def count_case_statement(case_str: str) -> int:
+    """Number of rows ``parse_case_statement`` would return, without expanding them."""
+    case_str = case_str.strip().lower()
+    when_blocks, else_val, _ = split_case_statement(case_str)
+    return sum(parse_condition(condition)[0].count() for condition, _ in when_blocks) + (else_val is not None)
+
+
+def output_columns(combo: Dict[str, str]) -> Tuple[str, ...]:
+    """Keys of a combo row that hold results: "direct mapped" and the output column set after it."""
+    return ("direct mapped", list(combo)[-1]) if "direct mapped" in combo else ()
+
+
+# Rows with at most this many conditions look their subsets up in the
+# kept rows; wider rows are compared against the kept rows one by one
+SUBSET_ENUMERATION_LIMIT = 10
+
+T = TypeVar('T')
+
+
+def iter_minimized(items: Iterable[Tuple[Hashable, Sequence[Hashable], T]]) -> Iterator[T]:
+    """Yield the ``item`` of each ``(output, conditions, item)`` unless an earlier kept one makes it redundant.
+
+    An item is dropped when the conditions of an earlier kept item with
+    the same output are a subset of its own: that item matches everything
+    this one does and comes first, so first-match results do not change.
+    Exact duplicates are the equal-set case and cost one hash probe.
+    """
+    kept: Dict[Hashable, Set[FrozenSet[Hashable]]] = {}
+    for output, conditions, item in items:
+        conditions = list(dict.fromkeys(conditions))
+        form = frozenset(conditions)
+        forms = kept.setdefault(output, set())
+        if form in forms:
+            continue
+        if len(conditions) <= SUBSET_ENUMERATION_LIMIT and 2 ** len(conditions) < len(forms):
+            subsets = (frozenset(subset) for size in range(len(conditions)) for subset in combinations(conditions, size))
+            covered = any(subset in forms for subset in subsets)
+        else:
+            covered = any(other <= form for other in forms)
+        if not covered:
+            forms.add(form)
+            yield item
+
+
+def iter_minimized_combos(combos: Iterable[Dict[str, str]],
+                          output_cols: Optional[Sequence[str]] = None) -> Iterator[Dict[str, str]]:
+    """Yield ``combos`` without the rows an earlier row with the same output makes redundant.
+
+    Rows are taken in priority order and go through ``iter_minimized``
+    with their conditions frozen into (column, value) pairs, '*' counting
+    as unconstrained. Conditions are compared as text, so ``>= 5`` does
+    not subsume ``>= 10``. ``output_cols`` default to ``output_columns``
+    of the first row.
+    """
+    def items():
+        nonlocal output_cols
+        for combo in combos:
+            if output_cols is None:
+                output_cols = output_columns(combo)
+            conditions = [(col, value) for col, value in combo.items() if col not in output_cols and value != '*']
+            yield tuple(combo.get(col) for col in output_cols), conditions, combo
+
+    yield from iter_minimized(items())
+
+
+def minimize_combos(combos: Iterable[Dict[str, str]],
+                    output_cols: Optional[Sequence[str]] = None) -> List[Dict[str, str]]:
+    return list(iter_minimized_combos(combos, output_cols))
 
-    # Make a nice column order
-    final_cols = sorted(all_cols - {"direct mapped", output_col})
-    final_cols += ["direct mapped", output_col]
 
-    return all_combos
\ No newline at end of file
+def parse_case_statement(case_str, minimize=False):
+    rows = iter_case_statement(case_str)
+    return minimize_combos(rows) if minimize else list(rows)
@@ -0,0 +1,170 @@
+"""Scaling benchmarks for the rollup implementations.
+
+Generates synthetic cash-flow frames over a grid of row counts, tree depths
+and column counts, times every rollup implementation on each frame and
+records its peak traced memory, and times a cold import of the rollup
+module against ``STARTUP_BUDGET_SECONDS``. Results are written as JSON so
+runs from different versions can be compared:
+
+    python -m src.rollup_benchmark --output bench.json
+    python -m src.rollup_benchmark --output new.json --baseline bench.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import product
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .cashflow_with_parent import generate_cashflow_frame
+from .rollup_to_parent import HierarchyRollupPlan, rollup, rollup_partitioned
+
+IMPLEMENTATIONS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    'index': lambda df: rollup(df),
+    'sparse_plan': lambda df: HierarchyRollupPlan.from_hierarchy(df['hierarchy']).rollup(df),
+    'fixed_point': lambda df: rollup(df, decimals=2),
+    'column_shards': lambda df: rollup(df, n_jobs=-1),
+    'partitioned': lambda df: rollup_partitioned(df, n_jobs=-1),
+}
+
+DEFAULT_ROWS = (100, 1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_DEPTHS = (1, 3, 6, 12)
+DEFAULT_COLS = (1, 10, 250, 1_000)
+# Grid points whose amount block exceeds this many cells are skipped
+DEFAULT_MAX_CELLS = 50_000_000
+# Cold-start budget for ``import src.rollup_to_parent`` in a fresh interpreter
+STARTUP_BUDGET_SECONDS = 0.5
+
+
+def _fanout(n_rows: int, max_depth: int) -> int:
+    """Smallest fan-out (at least 9, as in cashflow_with_parent) that yields enough unique paths."""
+    fanout = max(9, math.ceil(n_rows ** (1 / max_depth)))
+    while sum(fanout ** depth for depth in range(1, max_depth + 1)) < n_rows:
+        fanout += 1
+    return fanout
+
+
+def measure(func: Callable[[pd.DataFrame], pd.DataFrame], df: pd.DataFrame, repeat: int = 3) -> dict:
+    """Best wall time over ``repeat`` runs, plus peak traced memory of one extra run.
+
+    Only allocations in this process are traced, not those of pool workers.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+
+    # Measured separately because tracing slows the run down
+    tracemalloc.start()
+    try:
+        func(df)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def run_benchmarks(rows: Iterable[int] = DEFAULT_ROWS, depths: Iterable[int] = DEFAULT_DEPTHS,
+                   cols: Iterable[int] = DEFAULT_COLS, implementations: Optional[List[str]] = None,
+                   repeat: int = 3, seed: int = 0, max_cells: int = DEFAULT_MAX_CELLS) -> List[dict]:
+    """Time each implementation on every (rows, depth, cols) grid point."""
+    names = implementations or list(IMPLEMENTATIONS)
+    results = []
+    for n_rows, max_depth, n_cols in product(rows, depths, cols):
+        if n_rows * n_cols > max_cells:
+            continue
+        df = generate_cashflow_frame(n_rows, max_depth=max_depth, n_cols=n_cols,
+                                     fanout=_fanout(n_rows, max_depth), seed=seed)
+        for name in names:
+            results.append({'implementation': name, 'rows': n_rows, 'max_depth': max_depth,
+                            'cols': n_cols, **measure(IMPLEMENTATIONS[name], df, repeat)})
+    return results
+
+
+def measure_startup(module: str = f"{__package__}.rollup_to_parent", repeat: int = 5) -> float:
+    """Best wall time to import ``module`` in a fresh interpreter, excluding interpreter startup."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(repeat):
+        run = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=root)
+        timings.append(float(run.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: List[dict], current: List[dict], tolerance: float = 0.2) -> List[dict]:
+    """Return the grid points that got more than ``tolerance`` slower than ``baseline``."""
+    key = lambda r: (r['implementation'], r['rows'], r['max_depth'], r['cols'])
+    before = {key(r): r for r in baseline}
+    regressions = []
+    for result in current:
+        old = before.get(key(result))
+        if old and result['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append({**result, 'baseline_seconds': old['seconds']})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--depths', type=int, nargs='+', default=DEFAULT_DEPTHS)
+    parser.add_argument('--cols', type=int, nargs='+', default=DEFAULT_COLS)
+    parser.add_argument('--implementations', nargs='+', choices=list(IMPLEMENTATIONS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_CELLS)
+    parser.add_argument('--output', default='rollup_benchmark.json')
+    parser.add_argument('--baseline', help='earlier result file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_SECONDS)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.rows, args.depths, args.cols, args.implementations,
+                             args.repeat, args.seed, args.max_cells)
+    startup = measure_startup()
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'startup_seconds': startup,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    failed = startup > args.startup_budget
+    if failed:
+        print(f"STARTUP import took {startup:.3f}s, over the {args.startup_budget:.3f}s budget")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f)['results'], results, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['implementation']} rows={r['rows']} depth={r['max_depth']} "
+                  f"cols={r['cols']}: {r['baseline_seconds']:.4f}s -> {r['seconds']:.4f}s")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
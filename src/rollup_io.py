@@ -0,0 +1,138 @@
+"""Readers and writers for hierarchy frames in CSV and columnar formats.
+
+Input snapshots and rollup results can be written as CSV, Parquet, Feather
+or Arrow IPC. The columnar formats store the float amount columns in
+binary, so nothing is formatted as text. They can also be read back one
+column subset at a time, so a job that needs only a few dates reads only
+those columns. The format comes from the file suffix unless it is passed
+explicitly. pyarrow is only imported for the columnar formats.
+"""
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+FORMATS = ('csv', 'parquet', 'feather', 'arrow')
+
+_SUFFIXES = {
+    '.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet',
+    '.feather': 'feather', '.arrow': 'arrow', '.ipc': 'arrow',
+}
+# Compression used when none is given; Feather follows pyarrow's own default
+_DEFAULT_COMPRESSION = {'csv': None, 'parquet': 'snappy', 'feather': 'lz4', 'arrow': None}
+
+
+def frame_format(path: str, format: Optional[str] = None) -> str:
+    """Return ``format``, or the one implied by the suffix of ``path`` (ignoring .gz/.bz2/... for CSV)."""
+    if format is None:
+        name = str(path).lower()
+        for compressed in ('.gz', '.bz2', '.zip', '.xz', '.zst'):
+            if name.endswith('.csv' + compressed):
+                name = name[:-len(compressed)]
+        format = next((fmt for suffix, fmt in _SUFFIXES.items() if name.endswith(suffix)), None)
+        if format is None:
+            raise ValueError(f"Cannot tell the format of {path!r}; pass one of {FORMATS}")
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format {format!r}; choose from {FORMATS}")
+    return format
+
+
+def write_frames(chunks: Iterable[pd.DataFrame], path: str, format: Optional[str] = None,
+                 compression: Optional[str] = None, compression_level: Optional[int] = None) -> None:
+    """Write a stream of frames with the same columns to one file, a chunk at a time.
+
+    Each chunk becomes one Parquet row group or one Arrow record batch (or
+    is appended to the CSV), so the full frame never has to be in memory.
+    ``compression`` is a codec name such as 'zstd', 'lz4' or 'gzip' (for
+    CSV, a pandas compression such as 'gzip'); 'uncompressed' switches the
+    format's default codec off.
+    """
+    format = frame_format(path, format)
+    if compression is None:
+        compression = _DEFAULT_COMPRESSION[format]
+    elif compression == 'uncompressed':
+        compression = None
+
+    if format == 'csv':
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False,
+                         compression=compression)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if format == 'parquet':
+                    writer = pq.ParquetWriter(str(path), table.schema, compression=compression or 'none',
+                                              compression_level=compression_level)
+                else:
+                    # Feather V2 is the Arrow IPC file format, so both use the same writer
+                    codec = None if compression is None else pa.Codec(compression, compression_level)
+                    writer = pa.ipc.new_file(str(path), table.schema,
+                                             options=pa.ipc.IpcWriteOptions(compression=codec))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_frame(df: pd.DataFrame, path: str, format: Optional[str] = None,
+                compression: Optional[str] = None, compression_level: Optional[int] = None) -> None:
+    """Write ``df`` (without its index) to ``path``; see ``write_frames`` for the options."""
+    write_frames([df], path, format, compression, compression_level)
+
+
+def read_frame(path: str, columns: Optional[List[str]] = None, format: Optional[str] = None) -> pd.DataFrame:
+    """Read a frame written by ``write_frame``, optionally only the listed ``columns``.
+
+    Parquet and Arrow files only decode the selected columns. Arrow IPC
+    files are memory-mapped, so unselected columns are never read at all.
+    A 'hierarchy' column is always read as strings.
+    """
+    format = frame_format(path, format)
+    if format == 'csv':
+        df = pd.read_csv(path, usecols=columns, dtype={'hierarchy': str})
+        return df if columns is None else df[columns]
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if format == 'parquet':
+        table = pq.read_table(path, columns=columns)
+    else:
+        # The table's buffers keep the mapping open for as long as they are used
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    df = table.to_pandas()
+    if 'hierarchy' in df.columns:
+        df['hierarchy'] = df['hierarchy'].astype(str)
+    return df
+
+
+def iter_frames(path: str, chunksize: int = 100_000, columns: Optional[List[str]] = None,
+                format: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Yield a file as frames of up to ``chunksize`` rows (one per record batch for Arrow files)."""
+    format = frame_format(path, format)
+    if format == 'csv':
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns, dtype={'hierarchy': str}):
+            yield chunk if columns is None else chunk[columns]
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if format == 'parquet':
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns)
+        yield from (batch.to_pandas() for batch in batches)
+        return
+    reader = pa.ipc.open_file(pa.memory_map(str(path)))
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        yield batch.to_pandas()
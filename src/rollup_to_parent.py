@@ -1,7 +1,18 @@
-import time
-from typing import Any
-import pandas as pd
-from .cashflow_with_parent import df_cff  # Use relative import
+from __future__ import annotations
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from .hierarchy_index import HierarchyIndex
+
+# pandas is imported inside the functions that need it, so importing this
+# module stays cheap for callers that only want one function
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Sample data with multiple amount columns
 # data = {
@@ -13,41 +24,649 @@ from .cashflow_with_parent import df_cff  # Use relative import
 
 # df = pd.DataFrame(data)
 
-def rollup(df: Any) -> pd.DataFrame:
-    df.to_csv('synthetic_hierarchy_data.csv', index=False)
-    
+def _group_starts(group_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the order that sorts ``group_ids`` and where each group starts in it."""
+    order = np.argsort(group_ids, kind='stable')
+    sorted_ids = group_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    return order, starts
+
+
+def _reduce_blocks(df: pd.DataFrame, amount_cols: List[str],
+                   reduce: Callable[[np.ndarray], np.ndarray]) -> pd.DataFrame:
+    """Apply ``reduce`` to each dtype block so integer columns stay integers."""
+    import pandas as pd
+
+    dtypes = df[amount_cols].dtypes
+    blocks = {}
+    for _, cols in dtypes.groupby(dtypes, sort=False):
+        cols = list(cols.index)
+        blocks.update(zip(cols, reduce(df[cols].to_numpy()).T))
+    return pd.DataFrame({col: blocks[col] for col in amount_cols})
+
+
+AGGREGATIONS = ('sum', 'count', 'min', 'max', 'mean')
+
+# Header format of the date columns written by cashflow_with_parent
+DATE_FORMAT = '%d-%b-%Y'
+
+# Largest minor-unit magnitude a float64 amount can carry exactly
+_MAX_EXACT_MINOR = 2.0 ** 53
+# Headroom under 2**63 for the rounding error of the float bound itself
+_MAX_FIXED_TOTAL = 2.0 ** 63 * (1 - 1e-9)
+
+
+def _to_fixed(values: np.ndarray, decimals: int, buckets: Optional[_CalendarBuckets] = None) -> np.ndarray:
+    """Scale float amounts to int64 minor units (e.g. cents for decimals=2).
+
+    Raises OverflowError when an amount has more minor units than a float64
+    can hold exactly, or when the total of any column could overflow int64;
+    every node total is bounded by its column's absolute total. When the
+    columns will be summed into calendar ``buckets`` first, the bound is
+    taken over the bucket totals instead.
+    """
+    scaled = np.rint(values * 10.0 ** decimals)
+    if np.isnan(scaled).any():
+        raise ValueError("Fixed-point rollup needs amounts without NaN")
+    if scaled.size:
+        magnitude = np.abs(scaled)
+        if magnitude.max() >= _MAX_EXACT_MINOR:
+            raise OverflowError(f"Amounts too large for exact {decimals}-decimal fixed point")
+        if buckets is not None:
+            magnitude = buckets.reduce(magnitude)
+        if magnitude.sum(axis=0).max() >= _MAX_FIXED_TOTAL:
+            raise OverflowError("Fixed-point totals would overflow int64")
+    return scaled.astype(np.int64)
+
+
+def _fixed_point(reduce: Callable[[np.ndarray], np.ndarray], decimals: int) -> Callable[[np.ndarray], np.ndarray]:
+    """Wrap ``reduce`` so float blocks are summed exactly in int64 minor units."""
+    def reduce_fixed(values: np.ndarray) -> np.ndarray:
+        if values.dtype.kind != 'f':
+            return reduce(values)
+        return reduce(_to_fixed(values, decimals)) / 10.0 ** decimals
+    return reduce_fixed
+
+
+class _CalendarBuckets(NamedTuple):
+    """Grouping of date-header columns into calendar buckets."""
+    order: np.ndarray
+    starts: np.ndarray
+    labels: List[str]
+
+    def reduce(self, values: np.ndarray, ufunc: np.ufunc = np.add) -> np.ndarray:
+        """Reduce a (row x date) block to (row x bucket)."""
+        return ufunc.reduceat(values[:, self.order], self.starts, axis=1)
+
+
+def _calendar_buckets(columns: List[str], freq: str) -> _CalendarBuckets:
+    """Parse the date headers once and group them by pandas period ``freq`` ('W', 'M', 'Q', ...)."""
+    import pandas as pd
+
+    dates = pd.to_datetime(pd.Index(columns), format=DATE_FORMAT)
+    codes, periods = pd.factorize(dates.to_period(freq), sort=True)
+    order, starts = _group_starts(codes)
+    return _CalendarBuckets(order, starts, [str(period) for period in periods])
+
+
+def _aggregate_blocks(df: pd.DataFrame, amount_cols: List[str], index: HierarchyIndex,
+                      aggs: List[str], decimals: Optional[int] = None,
+                      buckets: Optional[_CalendarBuckets] = None) -> pd.DataFrame:
+    """Compute several statistics per node, naming each column ``<col>_<agg>``.
+
+    NaN-skipping sums and non-null counts share one additive fold over the
+    levels, min and max (NaN-skipping) take one fold each, and the mean is
+    derived from the sum and count, so extra statistics never rescan the frame. With
+    ``buckets`` each row is first reduced into its calendar buckets and the
+    columns are named after the buckets instead.
+    """
+    import pandas as pd
+
+    unknown = [agg for agg in aggs if agg not in AGGREGATIONS]
+    if unknown:
+        raise ValueError(f"Unsupported aggregations {unknown}; choose from {AGGREGATIONS}")
+    if buckets is None:
+        dtypes = df[amount_cols].dtypes
+        blocks = [(list(cols.index),) * 2 for _, cols in dtypes.groupby(dtypes, sort=False)]
+        out_names = amount_cols
+    else:
+        blocks = [(amount_cols, buckets.labels)]
+        out_names = buckets.labels
+
+    stats = {}
+    for cols, names in blocks:
+        values = df[cols].to_numpy()
+        scale = 1
+        if decimals is not None and values.dtype.kind == 'f':
+            values, scale = _to_fixed(values, decimals, buckets), 10.0 ** decimals
+        leaf = (lambda x, ufunc=np.add: x) if buckets is None else buckets.reduce
+        results = {}
+        present = pd.notna(values)
+        if {'sum', 'count', 'mean'} & set(aggs):
+            # NaNs are skipped by the sum as well as the count, so the mean only sees present values
+            sums = leaf(np.where(present, values, 0) if values.dtype.kind == 'f' else values)
+            folded = index.rollup_values(np.hstack([sums, leaf(present.astype(np.int64))]))
+            sums = folded[:, :len(names)].astype(sums.dtype, copy=False)
+            results['count'] = folded[:, len(names):].astype(np.int64)
+            results['sum'] = sums / scale if scale != 1 else sums
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results['mean'] = sums / results['count'] / scale
+        for agg, ufunc in (('min', np.fmin), ('max', np.fmax)):
+            if agg in aggs:
+                extreme = index.rollup_values(leaf(values, ufunc), ufunc)
+                if values.dtype.kind == 'f':
+                    # The fold starts from +-inf, which a node without any present value keeps
+                    if 'count' not in results:
+                        results['count'] = index.rollup_values(leaf(present.astype(np.int64)))
+                    extreme = np.where(results['count'] > 0, extreme, np.nan)
+                results[agg] = extreme / scale if scale != 1 else extreme
+        for i, name in enumerate(names):
+            for agg in aggs:
+                stats[f"{name}_{agg}"] = results[agg][:, i]
+    return pd.DataFrame({f"{name}_{agg}": stats[f"{name}_{agg}"] for name in out_names for agg in aggs})
+
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Copy ``array`` into a new shared memory block and return a view on it."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, view
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype: str) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _rollup_shard(spec: dict) -> None:
+    """Worker: sum columns [lo, hi) of the shared value block into the shared output."""
+    handles = []
+    try:
+        arrays = {}
+        for key in ('values', 'rows', 'starts', 'out'):
+            shm, arrays[key] = _attach(*spec[key])
+            handles.append(shm)
+        lo, hi = spec['cols']
+        # Values are stored column-major, so a column shard is one contiguous slab
+        block = arrays['values'][lo:hi][:, arrays['rows']]
+        arrays['out'][lo:hi] = np.add.reduceat(block, arrays['starts'], axis=1)
+    finally:
+        for shm in handles:
+            shm.close()
+
+
+def _parallel_group_sum(values: np.ndarray, row_idx: np.ndarray, node_ids: np.ndarray,
+                        n_jobs: int) -> np.ndarray:
+    """Sum the value rows into their ancestor nodes, column-sharded over a process pool.
+
+    The value block, the grouping arrays and the output live in shared
+    memory, so workers only receive block names and their column range.
+    """
+    order, starts = _group_starts(node_ids)
+    n_cols = values.shape[1]
+
+    handles = []
+    try:
+        specs, views = {}, {}
+        for key, array in (('values', np.ascontiguousarray(values.T)), ('rows', row_idx[order]),
+                           ('starts', starts), ('out', np.zeros((n_cols, len(starts)), dtype=values.dtype))):
+            shm, views[key] = _share(array)
+            handles.append(shm)
+            specs[key] = (shm.name, views[key].shape, views[key].dtype.str)
+
+        shards = [(int(a[0]), int(a[-1]) + 1) for a in np.array_split(np.arange(n_cols), n_jobs) if len(a)]
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            list(pool.map(_rollup_shard, [{**specs, 'cols': cols} for cols in shards]))
+        return np.array(views['out'].T)
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+
+class HierarchyRollupPlan:
+    """Reusable rollup over a fixed set of hierarchy paths.
+
+    Holds a sparse (node x row) incidence matrix with a 1 wherever the node is
+    the row itself or one of its ancestors, so rolling up any value matrix
+    whose rows line up with ``paths`` is a single sparse mat-mul. Plans are
+    picklable and can be shipped to worker processes or cached on disk.
+    """
+
+    def __init__(self, paths: np.ndarray, nodes: np.ndarray, incidence: Any):
+        self.paths = paths
+        self.nodes = nodes
+        self.incidence = incidence
+
+    @classmethod
+    def from_hierarchy(cls, hierarchy: Any) -> 'HierarchyRollupPlan':
+        from scipy import sparse
+
+        paths = np.asarray(hierarchy, dtype=object)
+        index = HierarchyIndex.from_paths(paths)
+        row_idx, node_ids = index.ancestor_pairs()
+        incidence = sparse.csr_matrix(
+            (np.ones(len(row_idx), dtype=np.int8), (node_ids, row_idx)),
+            shape=(len(index), len(paths)),
+        )
+        return cls(paths, index.keys(), incidence)
+
+    @property
+    def n_nodes(self) -> int:
+        return self.incidence.shape[0]
+
+    @property
+    def n_rows(self) -> int:
+        return self.incidence.shape[1]
+
+    def matches(self, hierarchy: Any) -> bool:
+        """Check that ``hierarchy`` lists the same paths in the same order."""
+        return len(hierarchy) == self.n_rows and np.array_equal(
+            np.asarray(hierarchy, dtype=object), self.paths)
+
+    def rollup_values(self, values: np.ndarray) -> np.ndarray:
+        """Roll up a (row x column) value matrix aligned with ``paths``."""
+        if len(values) != self.n_rows:
+            raise ValueError(f"Expected {self.n_rows} rows, got {len(values)}")
+        return self.incidence @ values
+
+    def rollup(self, df: pd.DataFrame, amount_cols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Roll up the amount columns of a frame whose rows line up with ``paths``."""
+        if amount_cols is None:
+            amount_cols = [col for col in df.columns if col != 'hierarchy']
+        sums = _reduce_blocks(df, amount_cols, self.rollup_values)
+        sums.insert(0, 'hierarchy', self.nodes)
+        return sums
+
+
+@lru_cache(maxsize=8)
+def _cached_plan(paths: Tuple[str, ...]) -> HierarchyRollupPlan:
+    return HierarchyRollupPlan.from_hierarchy(paths)
+
+
+def cached_plan(hierarchy: Any) -> HierarchyRollupPlan:
+    """Return a plan for ``hierarchy``, reusing one built earlier in this process."""
+    return _cached_plan(tuple(hierarchy))
+
+
+class IncrementalRollup:
+    """Rollup aggregate kept current under leaf-row inserts, updates and deletes.
+
+    Starts from a previously computed ``agg_df`` and only touches the
+    ancestors of the changed rows, so a delta costs O(delta rows x depth) no
+    matter how big the aggregate is. Pass ``row_counts`` (rows beneath each
+    node, as returned by ``from_frame``) to have nodes whose last row is
+    deleted dropped, exactly as a full recompute would; without them such
+    nodes stay in the aggregate with zero sums.
+    """
+
+    def __init__(self, agg_df: pd.DataFrame, row_counts: Optional[np.ndarray] = None):
+        self.amount_cols = [col for col in agg_df.columns if col != 'hierarchy']
+        self._dtypes = agg_df[self.amount_cols].dtypes.copy()
+        self._keys = list(agg_df['hierarchy'])
+        self._pos = {key: i for i, key in enumerate(self._keys)}
+        self._values = agg_df[self.amount_cols].to_numpy(copy=True)
+        self._counts = None if row_counts is None else np.array(row_counts, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'IncrementalRollup':
+        """Roll up ``df`` from scratch, keeping the per-node row counts."""
+        amount_cols = [col for col in df.columns if col != 'hierarchy']
+        index = HierarchyIndex.from_paths(df['hierarchy'])
+        sums = _reduce_blocks(df, amount_cols, index.rollup_values)
+        sums.insert(0, 'hierarchy', index.keys())
+        return cls(sums, index.rollup_values(np.ones(len(df), dtype=np.int64)))
+
+    def _positions(self, nodes: np.ndarray) -> np.ndarray:
+        """Look up (or append zeroed rows for) the given node keys."""
+        new_keys = [key for key in nodes if key not in self._pos]
+        if new_keys:
+            start = len(self._keys)
+            self._keys.extend(new_keys)
+            self._pos.update((key, start + i) for i, key in enumerate(new_keys))
+            self._values = np.concatenate(
+                [self._values, np.zeros((len(new_keys), len(self.amount_cols)), dtype=self._values.dtype)])
+            if self._counts is not None:
+                self._counts = np.concatenate([self._counts, np.zeros(len(new_keys), dtype=np.int64)])
+        return np.fromiter((self._pos[key] for key in nodes), dtype=np.intp, count=len(nodes))
+
+    def _add(self, rows: pd.DataFrame, sign: int) -> None:
+        if rows is None or rows.empty:
+            return
+        index = HierarchyIndex.from_paths(rows['hierarchy'])
+        nodes = index.keys()
+        if sign < 0:
+            missing = [key for key in nodes if key not in self._pos]
+            if missing:
+                raise KeyError(f"Cannot remove rows under unknown nodes: {missing}")
+        values = rows[self.amount_cols].to_numpy()
+        for col, dtype in rows[self.amount_cols].dtypes.items():
+            self._dtypes[col] = np.result_type(self._dtypes[col], dtype)
+        self._values = self._values.astype(np.result_type(self._values, values), copy=False)
+
+        positions = self._positions(nodes)
+        self._values[positions] += sign * index.rollup_values(values)
+        if self._counts is not None:
+            self._counts[positions] += sign * index.rollup_values(np.ones(len(rows), dtype=np.int64))
+
+    def apply(self, inserted: Optional[pd.DataFrame] = None, deleted: Optional[pd.DataFrame] = None,
+              updated: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None) -> 'IncrementalRollup':
+        """Fold a delta into the aggregate.
+
+        ``deleted`` holds the removed rows with the values they had, and an
+        update is given as ``(before, after)`` frames of the changed rows.
+        """
+        self._add(deleted, -1)
+        if updated is not None:
+            before, after = updated
+            self._add(before, -1)
+            self._add(after, 1)
+        self._add(inserted, 1)
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the aggregate in the same layout ``rollup`` returns."""
+        import pandas as pd
+
+        keys = np.asarray(self._keys, dtype=object)
+        live = np.arange(len(keys)) if self._counts is None else np.flatnonzero(self._counts > 0)
+        # Preorder with siblings sorted by segment, as HierarchyIndex numbers the nodes for ``rollup``
+        order = live[np.argsort(HierarchyIndex.from_paths(keys[live]).row_nodes, kind='stable')]
+        agg_df = pd.DataFrame(self._values[order], columns=self.amount_cols).astype(self._dtypes.to_dict())
+        agg_df.insert(0, 'hierarchy', keys[order])
+        return agg_df
+
+
+class SubtreeTotals:
+    """On-demand totals for individual hierarchy nodes over a frame of rows.
+
+    Nothing is rolled up up front: rows are kept ordered by node id, so the
+    rows under any node form one contiguous slice found with the index's
+    subtree range. A node's total is assembled from its own rows plus its
+    children's totals, and both the node and the children summed on the way
+    are memoized, so repeated and overlapping queries reuse earlier work. Call ``invalidate`` (or
+    ``update``, which calls it) when leaf values change.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.amount_cols = [col for col in df.columns if col != 'hierarchy']
+        self.index = HierarchyIndex.from_paths(df['hierarchy'])
+        order = np.argsort(self.index.row_nodes, kind='stable')
+        self._row_nodes = self.index.row_nodes[order]
+        self._values = df[self.amount_cols].to_numpy()[order]
+        self._memo: Dict[int, np.ndarray] = {}
+
+    def _rows(self, lo: int, hi: int) -> slice:
+        """Slice of the sorted rows whose node id lies in [lo, hi)."""
+        start, stop = np.searchsorted(self._row_nodes, [lo, hi])
+        return slice(int(start), int(stop))
+
+    def _total(self, node: int) -> np.ndarray:
+        total = self._memo.get(node)
+        if total is None:
+            total = self._values[self._rows(node, node + 1)].sum(axis=0)
+            child, end = node + 1, node + int(self.index.size[node])
+            while child < end:
+                next_child = child + int(self.index.size[child])
+                child_total = self._memo.get(child)
+                if child_total is None:
+                    child_total = self._memo[child] = self._values[self._rows(child, next_child)].sum(axis=0)
+                total = total + child_total
+                child = next_child
+            self._memo[node] = total
+        return total
+
+    def totals(self, path: str) -> pd.Series:
+        """Totals of every amount column over ``path`` and its descendants."""
+        import pandas as pd
+
+        return pd.Series(self._total(self.index.node(path)), index=self.amount_cols, name=path)
+
+    def invalidate(self, paths: Optional[List[str]] = None) -> None:
+        """Forget memoized totals affected by changes to ``paths`` (all of them if None)."""
+        if paths is None:
+            self._memo.clear()
+            return
+        for path in paths:
+            node = self.index.node(path)
+            while node >= 0:
+                self._memo.pop(node, None)
+                node = int(self.index.parent[node])
+
+    def update(self, rows: pd.DataFrame) -> None:
+        """Replace the amounts of existing rows, matched by their hierarchy path."""
+        for path, values in zip(rows['hierarchy'], rows[self.amount_cols].to_numpy()):
+            node = self.index.node(path)
+            target = self._rows(node, node + 1)
+            if target.stop - target.start != 1:
+                raise KeyError(f"Expected exactly one row at {path!r}")
+            self._values[target] = values
+        self.invalidate(list(rows['hierarchy']))
+
+
+def rollup(df: Any, plan: Optional[HierarchyRollupPlan] = None, n_jobs: int = 1,
+           aggs: Optional[List[str]] = None, decimals: Optional[int] = None,
+           freq: Optional[str] = None) -> pd.DataFrame:
+    """Sum every amount column up to each ancestor of each row's hierarchy path.
+
+    ``n_jobs > 1`` (or -1 for all cores) shards the amount columns across a
+    process pool that reads the value block from shared memory; it pays off
+    on wide frames such as the 250 date columns of ``cashflow_with_parent``.
+
+    ``aggs`` picks statistics from ``AGGREGATIONS`` to compute in the same
+    pass; the output then has one ``<col>_<agg>`` column per pair instead of
+    the plain sums.
+
+    ``decimals`` switches float columns to exact fixed-point sums: amounts
+    are scaled to int64 minor units (cents for ``decimals=2``), added with
+    integer ops and scaled back, so totals carry no float drift. Raises
+    OverflowError if the scaled amounts cannot be summed exactly.
+
+    ``freq`` ('W', 'M', 'Q', ... as in pandas periods) treats the amount
+    columns as ``DATE_FORMAT`` dates and sums each row into calendar buckets
+    before the hierarchy rollup, so the result is node x bucket and the
+    node x day matrix is never built.
+    """
+    import pandas as pd
+
     # Identify all numeric columns to roll up (excluding 'hierarchy')
     amount_cols = [col for col in df.columns if col != 'hierarchy']
 
-    # Initialize a dictionary of dictionaries to store results
-    agg_dict = {}
+    if aggs is not None and (plan is not None or n_jobs != 1):
+        raise ValueError("aggs is only supported by the single-process index rollup")
+
+    buckets, scale = None, 1
+    if freq is not None:
+        buckets = _calendar_buckets(amount_cols, freq)
+        if aggs is None:
+            values = df[amount_cols].to_numpy()
+            if decimals is not None and values.dtype.kind == 'f':
+                values, scale, decimals = _to_fixed(values, decimals, buckets), 10.0 ** decimals, None
+            df = pd.DataFrame(buckets.reduce(values), columns=buckets.labels).assign(
+                hierarchy=df['hierarchy'].to_numpy())
+            amount_cols, buckets = list(buckets.labels), None
+
+    if plan is not None:
+        if not plan.matches(df['hierarchy']):
+            raise ValueError("plan was built for a different hierarchy column")
+        nodes, reduce = plan.nodes, plan.rollup_values
+    else:
+        index = HierarchyIndex.from_paths(df['hierarchy'])
+        nodes, reduce = index.keys(), index.rollup_values
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs > 1 and len(amount_cols) > 1:
+            row_idx, node_ids = index.ancestor_pairs()
+            reduce = lambda values: _parallel_group_sum(values, row_idx, node_ids, n_jobs)
+
+    if aggs is not None:
+        sums = _aggregate_blocks(df, amount_cols, index, aggs, decimals, buckets)
+    else:
+        sums = _reduce_blocks(df, amount_cols, reduce if decimals is None else _fixed_point(reduce, decimals))
+        if scale != 1:
+            sums = sums / scale
+    sums.insert(0, 'hierarchy', nodes)
+    return sums.reset_index(drop=True)
+
+def _fold_chunks(chunks: Iterable[pd.DataFrame]) -> Optional[IncrementalRollup]:
+    """Fold a stream of row chunks into one IncrementalRollup (None if there were no chunks)."""
+    acc = None
+    for chunk in chunks:
+        if acc is None:
+            acc = IncrementalRollup.from_frame(chunk)
+        else:
+            acc.apply(inserted=chunk)
+    return acc
+
+def rollup_csv(path: str, chunksize: int = 100_000, **read_csv_kwargs: Any) -> pd.DataFrame:
+    """Roll up a hierarchy CSV chunk by chunk.
+
+    Each chunk is folded into running per-node accumulators, so peak memory
+    grows with the number of distinct nodes rather than the number of rows.
+    """
+    import pandas as pd
+
+    dtype = {**read_csv_kwargs.pop('dtype', {}), 'hierarchy': str}
+    acc = _fold_chunks(pd.read_csv(path, chunksize=chunksize, dtype=dtype, **read_csv_kwargs))
+    if acc is None:
+        return rollup(pd.read_csv(path, nrows=0, dtype=dtype, **read_csv_kwargs))
+    return acc.to_frame()
+
+def rollup_parquet(path: str, batch_size: int = 100_000, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Roll up a hierarchy Parquet file one record batch at a time, like ``rollup_csv``."""
+    from .rollup_io import iter_frames, read_frame
+
+    acc = _fold_chunks(iter_frames(path, chunksize=batch_size, columns=columns, format='parquet'))
+    if acc is None:
+        return rollup(read_frame(path, columns=columns, format='parquet'))
+    return acc.to_frame()
+
+def _open_values(values_path: str, dtype: Optional[str], n_cols: Optional[int]) -> np.ndarray:
+    """Map a (row x column) amount matrix from a .npy file or a raw row-major binary file."""
+    if values_path.endswith('.npy'):
+        return np.load(values_path, mmap_mode='r')
+    if dtype is None or n_cols is None:
+        raise ValueError("Raw value files need dtype and n_cols")
+    return np.memmap(values_path, dtype=dtype, mode='r').reshape(-1, n_cols)
+
 
-    start_time = time.time()
+def rollup_memmap(hierarchy: Any, values_path: str, out_path: str, block_rows: int = 65_536,
+                  dtype: Optional[str] = None, n_cols: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Roll up an amount matrix that lives on disk into a memory-mapped .npy output.
 
-    # Iterate over rows to build up sums at each parent level
-    for _, row in df.iterrows():
-        path_parts = row['hierarchy'].split('.')
-        for i in range(1, len(path_parts) + 1):
-            parent_key = '.'.join(path_parts[:i])
-            if parent_key not in agg_dict:
-                agg_dict[parent_key] = {col: 0 for col in amount_cols}
-            for col in amount_cols:
-                agg_dict[parent_key][col] += row[col]
+    ``values_path`` is read through a memory map in blocks of ``block_rows``
+    rows, each added into its node's row of the mapped output, and the
+    levels are then folded into their parents in blocks of nodes as well.
+    Only the hierarchy index and one block are held in memory. Returns the
+    node keys and the mapped (node x column) output, in ``rollup`` order.
+    """
+    index = HierarchyIndex.from_paths(hierarchy)
+    values = _open_values(values_path, dtype, n_cols)
+    if len(values) != len(index.row_nodes):
+        raise ValueError(f"{values_path} has {len(values)} rows for {len(index.row_nodes)} paths")
 
-    # Convert agg_dict into a DataFrame
-    agg_df = pd.DataFrame([
-        {'hierarchy': key, **values} for key, values in agg_dict.items()
-    ])
+    out = np.lib.format.open_memmap(out_path, mode='w+', dtype=values.dtype,
+                                    shape=(len(index), values.shape[1]))
+    for start in range(0, len(values), block_rows):
+        stop = start + block_rows
+        np.add.at(out, index.row_nodes[start:stop], values[start:stop])
+    for level, nodes in index.levels():
+        if level > 1:
+            for start in range(0, len(nodes), block_rows):
+                block = nodes[start:start + block_rows]
+                np.add.at(out, index.parent[block], out[block])
+    out.flush()
+    return index.keys(), out
 
-    # Calculate and display elapsed time
-    print(f"Elapsed time: {time.time() - start_time}")
 
-    # Optional: sort by hierarchy level and name
-    agg_df['level'] = agg_df['hierarchy'].apply(lambda x: len(x.split('.')))
-    agg_df = agg_df.sort_values(by=['level', 'hierarchy']).drop(columns='level').reset_index(drop=True)
+def _rollup_partition(args: Tuple[pd.DataFrame, dict]) -> pd.DataFrame:
+    part, kwargs = args
+    return rollup(part, **kwargs)
 
+
+def rollup_partitioned(df: pd.DataFrame, n_jobs: int = -1, total_label: Optional[str] = None,
+                       **rollup_kwargs: Any) -> pd.DataFrame:
+    """Roll up each top-level subtree in its own worker process.
+
+    Rows are hashed into ``n_jobs`` partitions by the first path segment.
+    Subtrees never share nodes, so each partition is rolled up on its own
+    and the results are only concatenated. This scales across cores even
+    with few amount columns, where column sharding does not help. With
+    ``total_label`` a grand-total row of the top-level sums is prepended
+    under that hierarchy label. ``rollup_kwargs`` are passed on to ``rollup``.
+    """
+    import pandas as pd
+
+    if total_label is not None and rollup_kwargs.get('aggs') is not None:
+        raise ValueError("total_label only applies to plain sums")
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    top = df['hierarchy'].astype(str).str.split('.', n=1).str[0].to_numpy(dtype=object)
+    partition = pd.util.hash_array(top) % max(n_jobs, 1)
+    parts = [df[partition == i] for i in np.unique(partition)]
+
+    if len(parts) > 1:
+        with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+            results = list(pool.map(_rollup_partition, [(part, rollup_kwargs) for part in parts]))
+    else:
+        results = [rollup(part, **rollup_kwargs) for part in parts] or [rollup(df, **rollup_kwargs)]
+    agg_df = pd.concat(results, ignore_index=True)
+
+    # Each subtree is already in path order; only the subtrees need ordering
+    node_top = agg_df['hierarchy'].str.split('.', n=1).str[0].to_numpy(dtype=object)
+    agg_df = agg_df.iloc[np.argsort(node_top, kind='stable')].reset_index(drop=True)
+
+    if total_label is not None:
+        is_top = ~agg_df['hierarchy'].str.contains('.', regex=False)
+        amount_cols = [col for col in agg_df.columns if col != 'hierarchy']
+        reduce = lambda values: values.sum(axis=0, keepdims=True)
+        decimals = rollup_kwargs.get('decimals')
+        total = _reduce_blocks(agg_df[is_top], amount_cols,
+                               reduce if decimals is None else _fixed_point(reduce, decimals))
+        total.insert(0, 'hierarchy', total_label)
+        agg_df = pd.concat([total, agg_df], ignore_index=True)
     return agg_df
 
-df = df_cff
-agg_df = rollup(df)
-print(agg_df)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: ``python -m src.rollup_to_parent input.csv output.parquet``.
+
+    Input and output can be CSV, Parquet, Feather or Arrow IPC files (see
+    ``rollup_io``). Plain sums are streamed: the input is read in chunks of
+    ``--chunksize`` rows and only the per-node totals are held in memory.
+    ``--jobs``, ``--agg``, ``--decimals`` and ``--freq`` load the whole
+    input and use ``rollup_partitioned`` (for ``--jobs``) or ``rollup``.
+    """
+    from .rollup_io import FORMATS, iter_frames, read_frame, write_frame
+
+    parser = argparse.ArgumentParser(description="Roll hierarchy amounts up to every parent node.")
+    parser.add_argument('input', help="CSV, Parquet, Feather or Arrow file with a 'hierarchy' column")
+    parser.add_argument('output', help="file to write the rolled-up frame to, format taken from its suffix")
+    parser.add_argument('--jobs', type=int, default=1, help="worker processes, -1 for all cores")
+    parser.add_argument('--agg', nargs='+', choices=AGGREGATIONS, help="statistics to compute instead of sums")
+    parser.add_argument('--decimals', type=int, help="sum float amounts exactly with this many decimals")
+    parser.add_argument('--freq', help="sum date columns into calendar buckets ('W', 'M', 'Q', ...)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per streamed chunk")
+    parser.add_argument('--output-format', choices=FORMATS, help="output format if not given by the suffix")
+    parser.add_argument('--compression', help="output codec such as 'zstd', 'lz4' or 'uncompressed'")
+    args = parser.parse_args(argv)
+
+    agg_df = None
+    if args.jobs == 1 and args.agg is None and args.decimals is None and args.freq is None:
+        acc = _fold_chunks(iter_frames(args.input, chunksize=args.chunksize))
+        agg_df = acc.to_frame() if acc is not None else None
+    if agg_df is None:
+        df = read_frame(args.input)
+        kwargs = {'aggs': args.agg, 'decimals': args.decimals, 'freq': args.freq}
+        if args.jobs == 1:
+            agg_df = rollup(df, **kwargs)
+        else:
+            agg_df = rollup_partitioned(df, n_jobs=args.jobs, **kwargs)
+
+    write_frame(agg_df, args.output, format=args.output_format, compression=args.compression)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""On-disk cache of parsed CASE rules, keyed by rule key and a hash of the CASE text.
+
+Each entry is one JSON file ``<key>.<hash>.json`` holding the combo rows
+``parse_case_statement`` returned, so after an edit to a rules file only
+the blocks whose text changed have to be parsed again. The hash includes
+``CACHE_VERSION``, which is bumped whenever the parser's output changes,
+so entries written by an older parser are never reused, and whether the
+rows were minimized.
+"""
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+CACHE_VERSION = 1
+
+
+def rule_hash(case_str: str, minimize: bool = False) -> str:
+    """Content hash of a CASE block, as used in cache file names and output manifests."""
+    text = f"{CACHE_VERSION}\0{case_str}" + ("\0minimized" if minimize else "")
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write ``data`` as JSON so that readers never see a half-written file."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class ParsedRuleCache:
+    """Parsed combos per rule key, stored under ``directory``.
+
+    With ``minimize`` the entries hold the rows of
+    ``parse_case_statement(case_str, minimize=True)``.
+    """
+
+    def __init__(self, directory: str, minimize: bool = False):
+        self.directory = directory
+        self.minimize = minimize
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str, case_str: str) -> str:
+        return os.path.join(self.directory, f"{key}.{rule_hash(case_str, self.minimize)}.json")
+
+    def __contains__(self, item) -> bool:
+        key, case_str = item
+        return os.path.exists(self.path(key, case_str))
+
+    def get(self, key: str, case_str: str) -> Optional[List[Dict[str, str]]]:
+        """The cached combos for this exact text of ``key``, or None."""
+        try:
+            with open(self.path(key, case_str)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, case_str: str, combos: List[Dict[str, str]]) -> None:
+        """Store ``combos`` for ``key`` and drop the entries of its earlier texts."""
+        path = self.path(key, case_str)
+        write_json_atomic(path, combos)
+        for old in glob.glob(os.path.join(glob.escape(self.directory), f"{key}.*.json")):
+            if old != path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from case_evaluator import CaseEvaluator, compile_case_statement, parse_predicate
+from parse_case_statements import parse_case_statement
+
+CASE_SQL = """case
+    when a in (1, 2, 3) and b = 'x' then 'one'
+    when a in (1, 4) or c >= date('2024-02-01') then 'two'
+    when b <> 'y' and a > 2 then 'three'
+    when (a = 5 and b in ('y', 'z')) or (a = 6 and b = 'x') then 'four'
+    else 'other'
+end as out"""
+
+
+def _row_by_row(r):
+    if r.a in (1, 2, 3) and r.b == 'x':
+        return 'one'
+    if r.a in (1, 4) or r.c >= pd.Timestamp('2024-02-01'):
+        return 'two'
+    if r.b != 'y' and r.a > 2:
+        return 'three'
+    if (r.a == 5 and r.b in ('y', 'z')) or (r.a == 6 and r.b == 'x'):
+        return 'four'
+    return 'other'
+
+
+def test_vectorized_evaluation_matches_row_by_row():
+    rng = np.random.default_rng(0)
+    n = 5_000
+    df = pd.DataFrame({
+        'a': rng.integers(0, 8, n),
+        'b': rng.choice(['x', 'y', 'z'], n),
+        'c': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, n), unit='D'),
+    })
+    evaluator = compile_case_statement(CASE_SQL)
+    result = evaluator.apply(df)
+
+    assert [output for output, _ in evaluator.branches] == ['one', 'two', 'three', 'four']
+    assert evaluator.default == 'other'
+    assert result['out'].tolist() == [_row_by_row(r) for r in df.itertuples()]
+
+
+def test_first_match_wins_and_rows_without_else_get_none():
+    rows = parse_case_statement("case when a = 1 then 'p' when a in (1, 2) then 'q' when a = 2 then 'p' end as o")
+    evaluator = CaseEvaluator.from_rows(rows)
+    df = pd.DataFrame({'a': ['1', '2', '3', None]})
+
+    assert evaluator.output_col == 'o'
+    assert [output for output, _ in evaluator.branches] == ['p', 'q', 'p']
+    assert evaluator.branch_index(df).tolist() == [0, 1, 3, 3]
+    assert evaluator.evaluate(df).tolist() == ['p', 'q', None, None]
+    # NULL is neither equal nor unequal to a literal
+    assert compile_case_statement("case when a <> '1' then 'ne' else 'e' end").evaluate(df).tolist() == [
+        'e', 'ne', 'ne', 'e']
+
+
+def test_unsupported_expressions_and_missing_columns_raise():
+    assert parse_predicate('c', "<= date ( '2023-01-01' )").value == pd.Timestamp('2023-01-01')
+    assert parse_predicate('c', '*') is None
+    with pytest.raises(ValueError):
+        compile_case_statement("case when c > dateadd(yy, 1, @postn_date) then 'x' end")
+    with pytest.raises(KeyError):
+        compile_case_statement("case when missing = 1 then 'x' end").evaluate(pd.DataFrame({'a': [1]}))
+
+
+def test_literals_and_column_names_keep_their_case():
+    evaluator = compile_case_statement("""CASE
+        WHEN Status = 'ACTIVE' AND t.Region IN ('EU', 'Apac') THEN 'Yes'
+        WHEN Status In ('active') THEN 'lower'
+        ELSE 'No'
+    END AS Flag""")
+    df = pd.DataFrame({'Status': ['ACTIVE', 'ACTIVE', 'active', 'Active'], 'Region': ['EU', 'US', 'Apac', 'EU']})
+
+    assert evaluator.output_col == 'Flag'
+    assert evaluator.apply(df)['Flag'].tolist() == ['Yes', 'No', 'lower', 'No']
+
+
+def test_several_predicates_on_one_column_all_apply():
+    evaluator = compile_case_statement("""case
+        when age >= 18 and age < 65 then 'adult'
+        when status <> 'a' and status <> 'b' then 'neither'
+        else 'other'
+    end""")
+    df = pd.DataFrame({'age': [40, 10, 70, 65, 5], 'status': ['a', 'c', 'b', 'x', 'a']})
+
+    assert evaluator.evaluate(df).tolist() == ['adult', 'neither', 'other', 'neither', 'other']
+
+
+def test_in_list_values_with_spaces_or_punctuation_are_strings():
+    evaluator = compile_case_statement(
+        "case when city in ('new york', 'la') then 'us' when code in ('A-1') then 'a' else 'x' end")
+    df = pd.DataFrame({'city': ['new york', 'la', 'paris', 'rome'], 'code': ['B', 'B', 'A-1', 'C']})
+
+    assert evaluator.evaluate(df).tolist() == ['us', 'us', 'a', 'x']
+    assert parse_predicate('city', 'new york').value == 'new york'
+    with pytest.raises(ValueError):
+        parse_predicate('c', 'now ( )')
@@ -0,0 +1,165 @@
+import tracemalloc
+
+import pytest
+from case_to_dict import _parse_tokens, clear_parse_cache, parse_condition, parse_condition_to_combos, tokenize_condition
+from parse_case_statements import (
+    count_case_statement, iter_case_statement, minimize_combos, parse_case_statement, split_case_statement,
+)
+
+
+def test_and_or_combos_keep_column_order():
+    combos, col_order = parse_condition_to_combos("(t.c1 = 1 or c1 in (2, 'x')) and c2 <> 'b' and c1 = 1")
+
+    assert combos == [{'c1': '1', 'c2': "!= 'b'"}]
+    assert col_order == ['c1', 'c2']
+    assert parse_condition_to_combos("c <= date('2023-01-01') or c > dateadd(yy, o, @postn_date)")[0] == [
+        {'c': "<= date ( '2023-01-01' )"}, {'c': '> dateadd ( yy , o , @postn_date )'},
+    ]
+
+
+def test_repeated_conditions_hit_the_cache():
+    clear_parse_cache()
+    first, _ = parse_condition_to_combos("c1 = 'v1' and c2 = 'v2'")
+    first[0]['direct mapped'] = 'mapped1'
+    again, _ = parse_condition_to_combos("c1 = 'v1'   and   c2 = 'v2'")
+
+    assert again == [{'c1': "'v1'", 'c2': "'v2'"}]
+    assert tokenize_condition("c1 = 'v1'   and   c2 = 'v2'") == ('c1', '=', "'v1'", 'and', 'c2', '=', "'v2'")
+    assert _parse_tokens.cache_info().hits == 1
+
+
+def test_parse_case_statement():
+    combos = parse_case_statement("""case
+       when c1 = 'v1' and c2 = 'v2' then 'mapped1'
+       when c1 = 'v3' or c2 = 'v4' then 'mapped2'
+       else 'default_val'
+    end as output_column""")
+
+    assert combos == [
+        {'c1': "'v1'", 'c2': "'v2'", 'direct mapped': 'mapped1', 'output_column': 'mapped1'},
+        {'c1': "'v3'", 'direct mapped': 'mapped2', 'output_column': 'mapped2'},
+        {'c2': "'v4'", 'direct mapped': 'mapped2', 'output_column': 'mapped2'},
+        {'c1': '*', 'c2': '*', 'direct mapped': 'default_val', 'output_column': 'default_val'},
+    ]
+
+
+def test_nested_case_and_keywords_inside_values():
+    combos = parse_case_statement("""CASE
+        WHEN a = 1 THEN CASE WHEN b = 2 THEN 'x' ELSE 'y' END
+        WHEN c = 'when' THEN when_flag
+        ELSE 'it''s the end'
+    END""")
+
+    assert combos == [
+        {'a': '1', 'direct mapped': "case when b = 2 then 'x' else 'y' end", 'output': "case when b = 2 then 'x' else 'y' end"},
+        {'c': "'when'", 'direct mapped': 'when_flag', 'output': 'when_flag'},
+        {'a': '*', 'c': '*', 'direct mapped': "it''s the end", 'output': "it''s the end"},
+    ]
+
+
+def test_split_case_statement_is_linear_in_whitespace():
+    when_blocks, else_value, output_col = split_case_statement(
+        "case when a = 1 then x" + " " * 100_000 + "y else b end as o")
+
+    assert when_blocks == [('a = 1', 'x' + ' ' * 100_000 + 'y')]
+    assert (else_value, output_col) == ('b', 'o')
+
+
+@pytest.mark.parametrize('statement', [
+    "when a = 1 then 2 end", "case when a = 1 then 2", "case when a = 1 else 2 end", "case then 2 end",
+    "case else 1 when a = 1 then 2 end",
+])
+def test_malformed_case_statements_raise(statement):
+    with pytest.raises(ValueError):
+        split_case_statement(statement)
+
+
+def test_combos_stay_factored_until_iterated():
+    values = ', '.join(str(i) for i in range(50))
+    combos, col_order = parse_condition(f"a in ({values}) and b in ({values}) and c in ({values}) and a <> 3")
+
+    assert combos.count() == 0 and list(combos) == []
+    combos, _ = parse_condition(f"a in ({values}) and b in ({values}) and (c = 1 or c = 2)")
+    assert combos.count() == 5000
+    assert combos.columns() == ['a', 'b', 'c']
+
+    rows = iter(combos)
+    assert [next(rows) for _ in range(3)] == [
+        {'a': '0', 'b': '0', 'c': '1'}, {'a': '0', 'b': '0', 'c': '2'}, {'a': '0', 'b': '1', 'c': '1'},
+    ]
+
+    # Counting an AND of ORs neither expands rows nor multiplies out terms
+    ors = ' and '.join('(' + ' or '.join(f"{col} = {i}" for i in range(50)) + ')' for col in 'abc')
+    clear_parse_cache()
+    tracemalloc.start()
+    try:
+        combos, _ = parse_condition(ors)
+        assert combos.count() == 125_000
+        assert combos.columns() == ['a', 'b', 'c']
+        assert tracemalloc.get_traced_memory()[1] < 1_000_000
+    finally:
+        tracemalloc.stop()
+    assert parse_condition("(a = 1 and a = 2 and b = 1) or c = 1")[0].columns() == ['c']
+
+
+def test_combos_dedup_drops_covered_terms():
+    combos, _ = parse_condition("a in (1, 2, 2) or a = 1 or (a = 3 and b = 4)")
+
+    assert combos.count() == 5
+    assert list(combos.dedup()) == [{'a': '1'}, {'a': '2'}, {'a': '3', 'b': '4'}]
+    assert list(parse_condition("a in (1, 2) or a in (2, 3) or a = 1")[0].dedup()) == [{'a': '1'}, {'a': '2'}, {'a': '3'}]
+
+    # Deduplicating never multiplies the AND of the ORs out
+    ors = ' and '.join('(' + ' or '.join(f"{col} = {i}" for i in range(50)) + ')' for col in 'abc')
+    combos, _ = parse_condition(ors)
+    tracemalloc.start()
+    try:
+        deduped = combos.dedup()
+        assert deduped.count() == 125_000
+        assert len(repr(deduped)) < 10_000
+        assert tracemalloc.get_traced_memory()[1] < 1_000_000
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_case_statement_streams_rows():
+    statement = "case when a in (1, 2) and b in (3, 4) then 'x' else 'y' end as out"
+    rows = iter_case_statement(statement)
+
+    assert next(rows) == {'a': '1', 'b': '3', 'direct mapped': 'x', 'out': 'x'}
+    assert list(rows)[-1] == {'a': '*', 'b': '*', 'direct mapped': 'y', 'out': 'y'}
+    assert count_case_statement(statement) == 5 == len(parse_case_statement(statement))
+
+
+def test_else_row_only_has_columns_of_yielded_rows():
+    rows = parse_case_statement("case when a = 1 and a = 2 and b = 3 then 'x' when c in () then 'y' "
+                                "when d = 1 then 'z' else 'w' end")
+
+    assert rows == [{'d': '1', 'direct mapped': 'z', 'output': 'z'}, {'d': '*', 'direct mapped': 'w', 'output': 'w'}]
+
+
+def test_minimize_drops_duplicates_and_rows_shadowed_by_a_more_general_row():
+    rows = parse_case_statement("""case
+        when a in (1, 2) and (b = 3 or b = 3) then 'x'
+        when a = 1 or a = 1 and c = 5 then 'x'
+        when a = 1 and c = 6 then 'y'
+        when a = 2 and b = 3 and c = 7 then 'x'
+        else 'z'
+    end as out""", minimize=True)
+
+    assert rows == [
+        {'a': '1', 'b': '3', 'direct mapped': 'x', 'out': 'x'},
+        {'a': '2', 'b': '3', 'direct mapped': 'x', 'out': 'x'},
+        {'a': '1', 'direct mapped': 'x', 'out': 'x'},
+        # Never reached, but it has another output, so it stays visible
+        {'a': '1', 'c': '6', 'direct mapped': 'y', 'out': 'y'},
+        {'a': '*', 'b': '*', 'c': '*', 'direct mapped': 'z', 'out': 'z'},
+    ]
+
+
+def test_minimize_wide_rows_and_explicit_output_columns():
+    wide = {f"c{i}": str(i) for i in range(12)}
+    combos = [{'c0': '0', 'result': 'r'}, {**wide, 'c0': '*', 'result': 'r'}, {**wide, 'result': 'r'},
+              {**wide, 'result': 's'}, {**wide, 'result': 's'}]
+
+    assert minimize_combos(combos, output_cols=('result',)) == [combos[0], combos[1], combos[3]]
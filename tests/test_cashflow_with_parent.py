@@ -0,0 +1,23 @@
+import pandas as pd
+from src.cashflow_with_parent import generate_cashflow_frame, write_cashflow_data
+
+
+def test_generate_cashflow_frame_is_seeded_and_unique():
+    df = generate_cashflow_frame(500, max_depth=4, n_cols=3, seed=7)
+
+    assert df.shape == (500, 4)
+    assert df['hierarchy'].is_unique
+    assert df['hierarchy'].str.count(r'\.').max() <= 3
+    assert list(df.columns[1:]) == ['01-Dec-2014', '02-Dec-2014', '03-Dec-2014']
+    pd.testing.assert_frame_equal(df, generate_cashflow_frame(500, max_depth=4, n_cols=3, seed=7))
+
+
+def test_write_cashflow_data_streams_chunks(tmp_path):
+    path = tmp_path / "cashflow.csv"
+
+    write_cashflow_data(path, 250, chunk_rows=100, n_cols=2, seed=1, max_depth=3, depth_weights=[0, 1, 1])
+
+    df = pd.read_csv(path, dtype={'hierarchy': str})
+    assert df.shape == (250, 3)
+    assert df['hierarchy'].is_unique
+    assert set(df['hierarchy'].str.count(r'\.')) == {1, 2}
@@ -0,0 +1,85 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from decision_index import DecisionIndex
+from parse_case_statements import parse_case_statement
+
+RULES = parse_case_statement("""case
+    when a in (1, 2) and c >= 10 then 'low'
+    when b = 'x' and c < 5 then 'small x'
+    when a = 3 or c <> 7 and b in ('y', 'z') then 'mixed'
+    when d > date('2024-06-01') then 'late'
+    else 'default'
+end as out""")
+
+
+def _scan(record):
+    a, b, c, d = (record.get(col) for col in 'abcd')
+    known = lambda *values: all(v is not None for v in values)
+    if known(a, c) and a in (1, 2) and c >= 10:
+        return 0 if a == 1 else 1
+    if known(b, c) and b == 'x' and c < 5:
+        return 2
+    if known(a) and a == 3:
+        return 3
+    if known(b, c) and c != 7 and b in ('y', 'z'):
+        return 4 if b == 'y' else 5
+    if known(d) and d > pd.Timestamp('2024-06-01'):
+        return 6
+    return 7
+
+
+def _records(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'a': rng.integers(0, 5, n),
+        'b': rng.choice(['x', 'y', 'z', 'w'], n),
+        'c': rng.integers(0, 15, n),
+        'd': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    })
+
+
+def test_lookup_matches_linear_scan():
+    index = DecisionIndex(RULES)
+    df = _records(2_000)
+
+    assert index.output_cols == ('direct mapped', 'out')
+    assert index.columns() == ['a', 'c', 'b', 'd']
+    assert [index.lookup(record) for record in df.to_dict('records')] == [_scan(r) for r in df.to_dict('records')]
+
+
+def test_else_row_is_the_fallback_and_nulls_match_nothing_else():
+    index = DecisionIndex(RULES)
+
+    assert index.match({'a': 1, 'c': 12})['out'] == 'low'
+    assert index.match({'a': 1, 'c': None, 'b': 'y'})['out'] == 'default'
+    assert index.lookup({'c': 7, 'b': 'y'}) == 7
+    assert DecisionIndex(RULES[:-1]).lookup({'c': 7, 'b': 'y'}) is None
+    # Every WHEN is contradictory, so the table has no rows at all
+    empty = DecisionIndex(parse_case_statement("case when a = 1 and a = 3 then 'x' end"))
+    assert len(empty) == 0
+    assert empty.lookup({'a': 1}) is None and empty.match({'a': 1}) is None
+    assert empty.lookup_frame(pd.DataFrame({'a': [1, 3]})).tolist() == [-1, -1]
+
+
+def test_lookup_frame_matches_single_lookups():
+    index = DecisionIndex(RULES)
+    df = _records(2_000)
+    df.loc[::7, 'c'] = np.nan
+    df = df.drop(columns='d')
+
+    expected = [index.lookup(record) for record in df.to_dict('records')]
+    assert index.lookup_frame(df).tolist() == [-1 if e is None else e for e in expected]
+    assert index.outputs(df.head(3)).tolist() == [RULES[e]['direct mapped'] for e in expected[:3]]
+    assert DecisionIndex(RULES).lookup_frame(df.iloc[:0]).tolist() == []
+
+
+def test_quoted_in_values_and_python_dates():
+    index = DecisionIndex(parse_case_statement(
+        "case when city in ('new york', 'la') then 'us' when d >= date('2024-06-01') then 'late' end"))
+
+    assert index.match({'city': 'new york'})['direct mapped'] == 'us'
+    assert index.lookup({'city': 'paris', 'd': datetime.date(2024, 7, 1)}) == 2
+    assert index.lookup({'city': 'paris', 'd': datetime.datetime(2024, 6, 1)}) == 2
+    assert index.lookup({'city': 'paris', 'd': datetime.date(2024, 5, 31)}) is None
@@ -0,0 +1,20 @@
+import numpy as np
+from src.hierarchy_index import HierarchyIndex
+
+
+def test_hierarchy_index_layout():
+    index = HierarchyIndex.from_paths(['2.1.1', '1.2.3.4', '1.2.3.5', '1'])
+
+    assert list(index.keys()) == ['1', '1.2', '1.2.3', '1.2.3.4', '1.2.3.5', '2', '2.1', '2.1.1']
+    assert list(index.depth) == [1, 2, 3, 4, 4, 1, 2, 3]
+    assert list(index.parent) == [-1, 0, 1, 2, 2, -1, 5, 6]
+    assert index.subtree(index.node('1.2')) == (1, 5)
+    assert list(index.keys()[index.row_nodes]) == ['2.1.1', '1.2.3.4', '1.2.3.5', '1']
+
+
+def test_hierarchy_index_rollup_values():
+    index = HierarchyIndex.from_paths(['1.2.3.4', '1.2.3.5', '2.1.1'])
+
+    sums = index.rollup_values(np.array([[10, 2], [20, 3], [15, 4]]))
+
+    assert sums.tolist() == [[30, 5], [30, 5], [30, 5], [10, 2], [20, 3], [15, 4], [15, 4], [15, 4]]
@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+import pytest
+from parse_case_file_to_excel import (
+    COMMON_COLUMNS, iter_decision_tables, load_rules_from_file, parse_case_file_to_excel,
+    update_decision_tables, write_decision_tables,
+)
+from rule_cache import ParsedRuleCache
+
+RULES = os.path.join(os.path.dirname(__file__), '..', 'src', 'resources', 'case_statements.txt')
+
+
+def test_parse_case_file_to_excel(tmp_path):
+    pytest.importorskip('openpyxl')
+    output = tmp_path / "case_statements.xlsx"
+    parse_case_file_to_excel(RULES, str(output), n_jobs=2)
+
+    sheets = pd.read_excel(output, sheet_name=None, dtype=str, keep_default_na=False)
+    assert list(sheets) == list(load_rules_from_file(RULES))
+    assert list(sheets['statement_2'].columns) == ["c", "c1", "c2", "age", "salary", "output_column"]
+    assert sheets['statement_2']['output_column'].tolist() == ['tier1', 'tier2', 'tier2', 'past', 'future', 'other']
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_decision_tables_stream_to_csv_and_parquet(tmp_path, n_jobs):
+    rules = {'r1': "case when c1 in (1, 2) and d = 'x' then 'hit' else 'miss' end as result"}
+
+    write_decision_tables(iter_decision_tables(rules, n_jobs=n_jobs), str(tmp_path / 'csv'), format='csv')
+    write_decision_tables(iter_decision_tables(rules, n_jobs=n_jobs), str(tmp_path / 'pq'), format='parquet')
+
+    expected = pd.DataFrame([
+        ['', '1', '', '', '', 'hit'], ['', '2', '', '', '', 'hit'], ['', '*', '', '', '', 'miss'],
+    ], columns=COMMON_COLUMNS)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'csv' / 'r1.csv', dtype=str, keep_default_na=False),
+                                  expected, check_dtype=False)
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'pq' / 'r1.parquet'), expected, check_dtype=False)
+
+
+def test_only_edited_rules_are_reparsed_and_rewritten(tmp_path):
+    rules = {f"r{i}": f"case when c1 = {i} then 'hit{i}' else 'miss' end as result" for i in range(4)}
+    output, cache = str(tmp_path / 'out'), ParsedRuleCache(str(tmp_path / 'cache'))
+
+    assert update_decision_tables(rules, output, cache=cache) == ['r0', 'r1', 'r2', 'r3']
+    assert update_decision_tables(rules, output, cache=cache) == []
+
+    edited = {**rules, 'r1': "case when c2 in (5, 6) then 'new' end as result", 'r4': rules['r0']}
+    del edited['r3']
+    assert update_decision_tables(edited, output, cache=cache) == ['r1', 'r4']
+    assert sorted(os.listdir(output)) == ['.decision_tables.json', 'r0.csv', 'r1.csv', 'r2.csv', 'r4.csv']
+    assert pd.read_csv(tmp_path / 'out' / 'r1.csv', dtype=str)['c2'].tolist() == ['5', '6']
+    # One entry per key and text; the entry of r1's old text is gone
+    assert len(os.listdir(cache.directory)) == 5
+    assert cache.get('r1', edited['r1'])[0] == {'c2': '5', 'direct mapped': 'new', 'result': 'new'}
+    # Cached blocks lay out exactly like freshly parsed ones
+    assert [(key, list(rows)) for key, rows in iter_decision_tables(edited, cache=cache)] == [
+        (key, list(rows)) for key, rows in iter_decision_tables(edited)]
+
+
+def test_switching_format_removes_files_of_the_old_format(tmp_path):
+    pytest.importorskip('pyarrow')
+    rules = {'r1': "case when c1 = 1 then 'hit' end as result", 'r2': "case when c2 = 2 then 'hit' end as result"}
+    output = str(tmp_path / 'out')
+
+    update_decision_tables(rules, output, format='csv')
+    assert update_decision_tables({'r1': rules['r1']}, output, format='parquet') == ['r1']
+    assert sorted(os.listdir(output)) == ['.decision_tables.json', 'r1.parquet']
+    update_decision_tables({}, output, format='parquet')
+    assert os.listdir(output) == ['.decision_tables.json']
+
+
+def test_minimize_writes_smaller_tables(tmp_path):
+    rules = {'r1': "case when c1 in (1, 2) then 'hit' when c1 = 1 and c2 = 3 then 'hit' "
+                   "when c1 in (2, 2) then 'hit' else 'miss' end as result"}
+    rules_file = tmp_path / 'rules.txt'
+    rules_file.write_text('r1:\n' + rules['r1'] + '\n')
+    full, small = str(tmp_path / 'full'), str(tmp_path / 'small')
+
+    parse_case_file_to_excel(str(rules_file), full, format='csv')
+    parse_case_file_to_excel(str(rules_file), small, format='csv', cache_dir=str(tmp_path / 'cache'), minimize=True)
+
+    assert len(pd.read_csv(os.path.join(full, 'r1.csv'))) == 6
+    assert pd.read_csv(os.path.join(small, 'r1.csv'), dtype=str)['c1'].tolist() == ['1', '2', '*']
+    assert len(ParsedRuleCache(str(tmp_path / 'cache'), minimize=True).get('r1', rules['r1'])) == 3
+    # Cached minimized tables match freshly minimized ones, and switching minimize rewrites the files
+    cache = ParsedRuleCache(str(tmp_path / 'cache'), minimize=True)
+    assert [list(rows) for _, rows in iter_decision_tables(rules, cache=cache, minimize=True)] == [
+        list(rows) for _, rows in iter_decision_tables(rules, n_jobs=2, minimize=True)]
+    assert update_decision_tables(rules, small, minimize=False) == ['r1']
+    with pytest.raises(ValueError):
+        list(iter_decision_tables(rules, cache=cache))
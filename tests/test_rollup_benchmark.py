@@ -0,0 +1,17 @@
+from src.rollup_benchmark import compare, run_benchmarks
+
+
+def test_run_benchmarks_records_time_and_memory():
+    results = run_benchmarks(rows=[50], depths=[1, 3], cols=[2], implementations=['index', 'fixed_point'], repeat=1)
+
+    assert len(results) == 4
+    assert {r['implementation'] for r in results} == {'index', 'fixed_point'}
+    assert all(r['seconds'] > 0 and r['peak_bytes'] > 0 for r in results)
+
+
+def test_compare_flags_slowdowns():
+    baseline = [{'implementation': 'index', 'rows': 50, 'max_depth': 1, 'cols': 2, 'seconds': 1.0}]
+    current = [{'implementation': 'index', 'rows': 50, 'max_depth': 1, 'cols': 2, 'seconds': 1.5}]
+
+    assert compare(baseline, current)[0]['baseline_seconds'] == 1.0
+    assert compare(baseline, current, tolerance=1.0) == []
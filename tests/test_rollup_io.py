@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from src.rollup_io import frame_format, iter_frames, read_frame, write_frame, write_frames
+from src.rollup_to_parent import main, rollup
+
+
+@pytest.fixture
+def sample_data():
+    return pd.DataFrame({
+        'hierarchy': ['1', '1.2', '1.2.3', '2', '2.1'],
+        '01-Dec-2014': [1.5, 2.25, 3.0, 4.0, 5.75],
+        '02-Dec-2014': [10.0, 20.0, 30.0, 40.0, 50.0],
+        '03-Dec-2014': [0.1, 0.2, 0.3, 0.4, 0.5],
+    })
+
+
+@pytest.mark.parametrize('name, compression', [
+    ('out.csv', None), ('out.csv.gz', 'gzip'), ('out.parquet', 'zstd'), ('out.feather', None),
+    ('out.arrow', 'lz4'), ('out.arrow', 'uncompressed'),
+])
+def test_round_trip_and_column_subset(tmp_path, sample_data, name, compression):
+    path = tmp_path / name
+    write_frame(sample_data, path, compression=compression)
+
+    pd.testing.assert_frame_equal(read_frame(path), sample_data)
+    columns = ['hierarchy', '03-Dec-2014']
+    pd.testing.assert_frame_equal(read_frame(path, columns=columns), sample_data[columns])
+
+
+def test_streamed_chunks_read_back_in_chunks(tmp_path, sample_data):
+    path = tmp_path / 'snapshot.dat'
+    write_frames([sample_data[:2], sample_data[2:]], path, format='arrow')
+
+    chunks = list(iter_frames(path, format='arrow', columns=['02-Dec-2014']))
+    assert [len(chunk) for chunk in chunks] == [2, 3]
+    assert pd.concat(chunks)['02-Dec-2014'].tolist() == sample_data['02-Dec-2014'].tolist()
+    with pytest.raises(ValueError):
+        frame_format(path)
+
+
+def test_cli_writes_columnar_output(tmp_path, sample_data):
+    write_frame(sample_data, tmp_path / 'in.feather')
+
+    main([str(tmp_path / 'in.feather'), str(tmp_path / 'out.parquet'), '--compression', 'zstd'])
+    pd.testing.assert_frame_equal(read_frame(tmp_path / 'out.parquet'), rollup(sample_data))
@@ -1,6 +1,14 @@
+import os
+import pickle
+import subprocess
+import sys
+import numpy as np
 import pytest
 import pandas as pd
-from src.rollup_to_parent import rollup
+from src.rollup_to_parent import (
+    HierarchyRollupPlan, IncrementalRollup, SubtreeTotals, cached_plan, main, rollup, rollup_csv, rollup_memmap,
+    rollup_parquet, rollup_partitioned,
+)
 
 # src/test_rollup_to_parent.py
 
@@ -26,4 +34,161 @@ def test_rollup(monkeypatch: pytest.MonkeyPatch, sample_data: pd.DataFrame):
     }
     expected_df = pd.DataFrame(expected_data)
     
-    pd.testing.assert_frame_equal(result, expected_df)
\ No newline at end of file
+    pd.testing.assert_frame_equal(result, expected_df)
+
+def test_rollup_plan_matches_rollup(monkeypatch: pytest.MonkeyPatch, sample_data: pd.DataFrame):
+    monkeypatch.setattr(pd.DataFrame, "to_csv", lambda self, *args, **kwargs: None)
+
+    plan = pickle.loads(pickle.dumps(HierarchyRollupPlan.from_hierarchy(sample_data['hierarchy'])))
+
+    pd.testing.assert_frame_equal(plan.rollup(sample_data), rollup(sample_data))
+    pd.testing.assert_frame_equal(rollup(sample_data, plan=plan), rollup(sample_data))
+    assert cached_plan(sample_data['hierarchy']) is cached_plan(sample_data['hierarchy'])
+
+
+def test_incremental_rollup_matches_full_recompute(monkeypatch: pytest.MonkeyPatch, sample_data: pd.DataFrame):
+    monkeypatch.setattr(pd.DataFrame, "to_csv", lambda self, *args, **kwargs: None)
+
+    inc = IncrementalRollup.from_frame(sample_data.iloc[:5])
+    before = sample_data.iloc[[3]]
+    after = before.assign(amount1=100)
+    inc.apply(inserted=sample_data.iloc[5:], deleted=sample_data.iloc[[4]], updated=(before, after))
+
+    expected = pd.concat([sample_data.iloc[:3], after, sample_data.iloc[5:]])
+    pd.testing.assert_frame_equal(inc.to_frame(), rollup(expected))
+
+    # Segments with characters sorting below '.' keep rollup's preorder
+    odd = pd.DataFrame({'hierarchy': ['a.c', 'a-b', 'a'], 'amount1': [1, 2, 3]})
+    assert IncrementalRollup.from_frame(odd).to_frame()['hierarchy'].tolist() == ['a', 'a.c', 'a-b']
+    pd.testing.assert_frame_equal(IncrementalRollup.from_frame(odd).to_frame(), rollup(odd))
+
+
+def test_rollup_csv_streams_chunks(tmp_path, sample_data: pd.DataFrame):
+    path = tmp_path / "hierarchy.csv"
+    sample_data.to_csv(path, index=False)
+
+    pd.testing.assert_frame_equal(rollup_csv(str(path), chunksize=3), rollup(sample_data))
+
+
+def test_rollup_parallel_column_shards(sample_data: pd.DataFrame):
+    pd.testing.assert_frame_equal(rollup(sample_data, n_jobs=2), rollup(sample_data))
+
+
+def test_rollup_multiple_aggregations(sample_data: pd.DataFrame):
+    result = rollup(sample_data, aggs=['sum', 'count', 'min', 'max', 'mean'])
+
+    assert list(result.columns[:6]) == ['hierarchy', 'amount1_sum', 'amount1_count',
+                                        'amount1_min', 'amount1_max', 'amount1_mean']
+    node_2 = result.set_index('hierarchy').loc['2']
+    assert node_2['amount1_sum'] == 15
+    assert node_2['amount1_count'] == 3
+    assert node_2['amount1_min'] == 0
+    assert node_2['amount1_max'] == 15
+    assert node_2['amount1_mean'] == 5.0
+
+    with_nan = rollup(pd.DataFrame({'hierarchy': ['1.1', '1.2', '1.3'], 'x': [1.0, np.nan, 3.0]}),
+                      aggs=['sum', 'count', 'mean'])
+    assert with_nan.iloc[0].tolist() == ['1', 4.0, 2, 2.0]
+    assert np.isnan(with_nan.loc[2, 'x_mean']) and with_nan.loc[2, 'x_count'] == 0
+
+    all_nan = rollup(pd.DataFrame({'hierarchy': ['1', '1.1'], 'a': [np.nan, np.nan]}), aggs=['min', 'max', 'count'])
+    assert all_nan[['a_min', 'a_max']].isna().all().all() and all_nan['a_count'].tolist() == [0, 0]
+    assert rollup(pd.DataFrame({'hierarchy': ['1', '1.1'], 'a': [np.nan, np.nan]}), aggs=['max'])['a_max'].isna().all()
+
+
+def test_rollup_fixed_point_is_exact():
+    df = pd.DataFrame({'hierarchy': ['1.1', '1.2', '1.3'], 'amount': [0.1, 0.2, 0.3]})
+
+    result = rollup(df, decimals=2)
+
+    assert result.loc[0, 'amount'] == 0.6
+    with pytest.raises(OverflowError):
+        rollup(df.assign(amount=1e17), decimals=2)
+
+
+def test_rollup_calendar_buckets():
+    df = pd.DataFrame({
+        'hierarchy': ['1.1', '1.2'],
+        '30-Nov-2014': [1, 2],
+        '01-Dec-2014': [10, 20],
+        '02-Dec-2014': [100, 200],
+    })
+
+    result = rollup(df, freq='M')
+
+    expected = pd.DataFrame({
+        'hierarchy': ['1', '1.1', '1.2'],
+        '2014-11': [3, 1, 2],
+        '2014-12': [330, 110, 220],
+    })
+    pd.testing.assert_frame_equal(result, expected)
+
+    # Each day's column fits in int64 cents but the month total does not
+    days = pd.date_range('2014-12-01', periods=31).strftime('%d-%b-%Y')
+    wide = pd.DataFrame(4.0e13, index=range(2000), columns=days).assign(hierarchy=[f"1.{i}" for i in range(2000)])
+    with pytest.raises(OverflowError):
+        rollup(wide, freq='M', decimals=2)
+    with pytest.raises(OverflowError):
+        rollup(wide, freq='M', decimals=2, aggs=['sum'])
+
+
+def test_subtree_totals_queries_and_updates(sample_data: pd.DataFrame):
+    query = SubtreeTotals(sample_data)
+
+    assert query.totals('1').tolist() == [30, 10]
+    # The child totals summed for '1' are memoized too
+    assert query.index.node('1.2') in query._memo
+    assert query.totals('1.2').tolist() == [30, 5]
+
+    query.update(pd.DataFrame({'hierarchy': ['1.2.3.4'], 'amount1': [40], 'amount2': [2]}))
+
+    assert query.totals('1').tolist() == [60, 10]
+    assert query.totals('2').tolist() == [15, 4]
+
+
+def test_rollup_memmap_matches_rollup(tmp_path, sample_data: pd.DataFrame):
+    values_path = str(tmp_path / "values.npy")
+    np.save(values_path, sample_data[['amount1', 'amount2']].to_numpy())
+
+    keys, out = rollup_memmap(sample_data['hierarchy'], values_path, str(tmp_path / "rollup.npy"), block_rows=3)
+
+    expected = rollup(sample_data)
+    assert list(keys) == list(expected['hierarchy'])
+    assert out.tolist() == expected[['amount1', 'amount2']].to_numpy().tolist()
+
+
+def test_rollup_partitioned_by_top_level(monkeypatch: pytest.MonkeyPatch, sample_data: pd.DataFrame):
+    result = rollup_partitioned(sample_data, n_jobs=2, total_label='total')
+
+    pd.testing.assert_frame_equal(result.iloc[1:].reset_index(drop=True), rollup(sample_data))
+    assert result.iloc[0].tolist() == ['total', 45, 14]
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("the arguments should be rejected before starting workers")
+    monkeypatch.setattr('src.rollup_to_parent.ProcessPoolExecutor', no_pool)
+    with pytest.raises(ValueError):
+        rollup_partitioned(sample_data, n_jobs=2, total_label='total', aggs=['sum'])
+
+
+def test_import_has_no_side_effects(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, src.rollup_to_parent; print('pandas' in sys.modules)"
+    run = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=tmp_path, env={**os.environ, 'PYTHONPATH': root})
+
+    assert run.stdout.strip() == 'False'
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cli_streams_csv_and_parquet(tmp_path, sample_data):
+    sample_data.to_csv(tmp_path / 'in.csv', index=False)
+    sample_data.to_parquet(tmp_path / 'in.parquet', index=False)
+
+    assert main([str(tmp_path / 'in.csv'), str(tmp_path / 'out.parquet'), '--chunksize', '3']) == 0
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'out.parquet'), rollup(sample_data))
+    pd.testing.assert_frame_equal(rollup_parquet(str(tmp_path / 'in.parquet'), batch_size=3), rollup(sample_data))
+
+    main([str(tmp_path / 'in.parquet'), str(tmp_path / 'out.csv'), '--agg', 'sum', 'max', '--jobs', '2'])
+    expected = rollup(sample_data, aggs=['sum', 'max'])
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'out.csv', dtype={'hierarchy': str}), expected,
+                                  check_dtype=False)